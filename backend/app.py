@@ -4,6 +4,7 @@ Production entry point for Dr. Kishan Bhalani Medical Documentation Services
 This file is used by hosting platforms like Railway, Render, etc.
 """
 
+import importlib.util
 import os
 import sys
 from pathlib import Path
@@ -11,11 +12,12 @@ from pathlib import Path
 # Add current directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-# Import the FastAPI app
-try:
+# Import the FastAPI app, resolving which module exists before importing so
+# only one import graph is loaded on cold start
+if importlib.util.find_spec("server") is not None:
     from server import app
     print("✅ Main server loaded successfully")
-except ImportError:
+else:
     try:
         from server_simple import app
         print("✅ Simplified server loaded successfully")
@@ -28,5 +30,18 @@ application = app
 
 if __name__ == "__main__":
     import uvicorn
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    from config import PORT, WEB_CONCURRENCY, UVICORN_LOOP
+    # Workers size their Supabase connection pools from this
+    os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+    # Workers need an import string so each process can load the app itself;
+    # httptools ships with uvicorn[standard], fail loudly if missing
+    uvicorn.run(
+        "app:app",
+        app_dir=str(Path(__file__).parent),
+        host="0.0.0.0",
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        loop=UVICORN_LOOP,
+        http="httptools",
+        access_log=False
+    )
@@ -0,0 +1,41 @@
+"""
+Environment configuration for Dr. Kishan Bhalani Medical Documentation Services
+
+Settings shared by the backend scripts, read once when this module is first
+imported.
+"""
+
+import importlib.util
+import os
+import sys
+from dotenv import load_dotenv
+from functools import lru_cache
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+SUPABASE_URL = os.environ.get('SUPABASE_URL')
+SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+PORT = int(os.environ.get('PORT', 8000))
+# Server worker processes, one unless set. Supabase connections are budgeted
+# across them, but per-process state is not: each worker enforces the rate
+# limit on its own, so the effective limit is WEB_CONCURRENCY times looser.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+# uvloop ships with uvicorn[standard] but has no Windows build
+UVICORN_LOOP = "asyncio" if sys.platform == "win32" else "uvloop"
+
+
+@lru_cache(maxsize=1)
+def get_supabase():
+    """Process-wide Supabase client, so scripts share one HTTP session"""
+    import httpx
+    from supabase import create_client, ClientOptions
+
+    # Keep connections alive between inserts; HTTP/2 (when h2 is installed)
+    # multiplexes concurrent requests over one TLS connection
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=40, max_keepalive_connections=20, keepalive_expiry=30),
+        http2=importlib.util.find_spec('h2') is not None
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
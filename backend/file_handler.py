@@ -5,26 +5,46 @@ This module handles secure file uploads, storage, and management with HIPAA comp
 """
 
 import os
+import re
+import asyncio
 import uuid
+import io
+import mmap
+import hashlib
+import tempfile
+import struct
 import mimetypes
+from datetime import datetime
+from types import MappingProxyType
 from pathlib import Path
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timezone, timedelta
+from enum import Enum
+from functools import lru_cache
 try:
     import magic
     HAS_MAGIC = True
 except ImportError:
     HAS_MAGIC = False
     magic = None
+try:
+    import blake3
+    HAS_BLAKE3 = True
+except ImportError:
+    HAS_BLAKE3 = False
+    blake3 = None
 from PIL import Image
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms
 import logging
 
 from fastapi import UploadFile, HTTPException, Request
 from pydantic import BaseModel
 from supabase import Client
+from postgrest.types import ReturnMethod
 
+from timestamps import utc_now_iso
+import hipaa_compliance
 from hipaa_compliance import (
-    HIPAAAuditLogger, HIPAAValidator, encryption,
+    HIPAAAuditLogger, HIPAAValidator, BatchWriter,
     AuditEventType, AuditLog
 )
 
@@ -33,6 +53,9 @@ logger = logging.getLogger(__name__)
 
 # File upload configuration
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB read/write/encrypt unit
+PHI_FRAME_HEADER = struct.Struct('>I')  # length prefix of each encrypted PHI frame
+LEGACY_PHI_PREFIX = b'gAAAAA'  # Fernet token text written by earlier releases
 ALLOWED_EXTENSIONS = {
     'images': {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'},
     'documents': {'.pdf', '.doc', '.docx', '.txt', '.rtf'},
@@ -40,11 +63,125 @@ ALLOWED_EXTENSIONS = {
     'archives': {'.zip', '.rar', '.7z'}
 }
 
+# Expected MIME type per extension, checked against the detected type
+EXPECTED_MIMES = {
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+# Every allowed extension -> top-level MIME type its content must have ('' when
+# unchecked), so validate_file needs a single lookup for both checks
+EXT_MIME_PREFIXES = MappingProxyType({
+    ext: EXPECTED_MIMES[ext].split('/')[0] if ext in EXPECTED_MIMES else ''
+    for exts in ALLOWED_EXTENSIONS.values()
+    for ext in exts
+})
+
+# Leading magic bytes for common uploads; a match skips libmagic entirely
+MAGIC_SIGNATURES = (
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+# Columns returned by list_files (the file list view needs nothing else)
+FILE_LIST_COLUMNS = 'id, original_filename, file_size, mime_type, file_category, is_phi, upload_status, created_at'
+
 UPLOAD_DIRECTORY = Path("uploads")
 UPLOAD_DIRECTORY.mkdir(exist_ok=True)
 
+class FileCategory(str, Enum):
+    """Storage categories, matching the file_uploads.file_category CHECK"""
+    MEDICAL_RECORD = 'medical_record'
+    SERVICE_RECORD = 'service_record'
+    PHOTO = 'photo'
+    DOCUMENT = 'document'
+    OTHER = 'other'
+
+
 # PHI-sensitive file types
-PHI_SENSITIVE_CATEGORIES = {'medical_record', 'service_record'}
+PHI_SENSITIVE_CATEGORIES = frozenset({FileCategory.MEDICAL_RECORD.value, FileCategory.SERVICE_RECORD.value})
+
+# Filename keywords for auto-categorization, compiled once per category and
+# checked in priority order
+MEDICAL_KEYWORDS = frozenset({
+    'medical', 'record', 'diagnosis', 'treatment', 'prescription', 'lab', 'xray', 'mri', 'ct'
+})
+SERVICE_KEYWORDS = frozenset({'service', 'military', 'dd214', 'discharge', 'veteran'})
+CATEGORY_KEYWORD_PATTERNS = (
+    (FileCategory.MEDICAL_RECORD.value, re.compile('|'.join(map(re.escape, sorted(MEDICAL_KEYWORDS))))),
+    (FileCategory.SERVICE_RECORD.value, re.compile('|'.join(map(re.escape, sorted(SERVICE_KEYWORDS))))),
+)
+IMAGE_MIME_PREFIXES = ('image/',)
+DOCUMENT_MIME_TYPES = frozenset({'application/pdf', 'application/msword', 'text/plain'})
+
+
+def file_extension(filename: str) -> str:
+    """Lower-cased extension of a filename, including the dot"""
+    return os.path.splitext(filename)[1].lower()
+
+
+@lru_cache(maxsize=256)
+def guess_mime_for_extension(file_ext: str) -> str:
+    """MIME type implied by an extension; cached since uploads reuse a few extensions"""
+    return mimetypes.guess_type(f"file{file_ext}")[0] or 'application/octet-stream'
+
+
+# libmagic results keyed by a digest of the header, so no upload's plaintext
+# (possibly PHI) stays in memory after its request
+MAGIC_MIME_CACHE_SIZE = 256
+_magic_mime_cache: Dict[bytes, Optional[str]] = {}
+
+
+def magic_mime_from_header(header: bytes) -> Optional[str]:
+    """libmagic MIME type for a file header; identical templates (DD214s, forms) repeat"""
+    key = hashlib.blake2b(header, digest_size=16).digest()
+    if key in _magic_mime_cache:
+        return _magic_mime_cache[key]
+    try:
+        mime = magic.from_buffer(header, mime=True)
+    except Exception:
+        mime = None
+    if len(_magic_mime_cache) >= MAGIC_MIME_CACHE_SIZE:
+        del _magic_mime_cache[next(iter(_magic_mime_cache))]  # evict the oldest entry
+    _magic_mime_cache[key] = mime
+    return mime
+
+
+def _spooled_fileno(fileobj) -> Optional[int]:
+    """File descriptor of an upload already rolled over to a temp file, else None"""
+    if not hasattr(os, 'copy_file_range'):
+        return None
+    if isinstance(fileobj, tempfile.SpooledTemporaryFile):
+        # fileno() would force an in-memory spool onto disk, so check first
+        if not getattr(fileobj, '_rolled', False):
+            return None
+        fileobj = fileobj._file
+    try:
+        return fileobj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def file_list_cursor(row: Dict[str, Any]) -> str:
+    """list_files cursor for the page after the one ending with row"""
+    return f"{row['created_at']},{row['id']}"
+
+
+def new_content_hasher(is_phi: bool = False):
+    """Return (algorithm, hasher) for upload integrity digests"""
+    if is_phi:
+        # PHI plaintext digests are keyed so a stored hash cannot confirm a guessed document
+        return 'blake2b-keyed', hipaa_compliance.encryption.phi_hasher()
+    if HAS_BLAKE3 and blake3:
+        return 'blake3', blake3.blake3()
+    return 'blake2b', hashlib.blake2b(digest_size=32)
 
 
 class FileUploadResponse(BaseModel):
@@ -74,10 +211,16 @@ class HIPAAFileHandler:
         self.supabase = supabase_client
         self.audit_logger = HIPAAAuditLogger(supabase_client)
         self.validator = HIPAAValidator()
+        self.access_log_writer = BatchWriter(
+            lambda rows: self.supabase.table('file_access_logs').insert(
+                rows, returning=ReturnMethod.minimal
+            ).execute(),
+            'file_access_logs'
+        )
 
         # Create upload directories
-        for category in ['medical_record', 'service_record', 'photo', 'document', 'other']:
-            (UPLOAD_DIRECTORY / category).mkdir(exist_ok=True)
+        for category in FileCategory:
+            (UPLOAD_DIRECTORY / category.value).mkdir(exist_ok=True)
 
     def validate_file(self, file: UploadFile) -> Dict[str, Any]:
         """Validate uploaded file for security and compliance"""
@@ -90,12 +233,9 @@ class HIPAAFileHandler:
             )
 
         # Check file extension
-        file_ext = Path(file.filename).suffix.lower()
-        allowed_exts = set()
-        for category_exts in ALLOWED_EXTENSIONS.values():
-            allowed_exts.update(category_exts)
-
-        if file_ext not in allowed_exts:
+        file_ext = file_extension(file.filename)
+        expected_prefix = EXT_MIME_PREFIXES.get(file_ext)
+        if expected_prefix is None:
             raise HTTPException(
                 status_code=400,
                 detail=f"File type {file_ext} not allowed"
@@ -105,25 +245,17 @@ class HIPAAFileHandler:
         file_content = file.file.read(1024)  # Read first 1KB for MIME detection
         file.file.seek(0)  # Reset file pointer
 
-        if HAS_MAGIC and magic:
-            try:
-                detected_mime = magic.from_buffer(file_content, mime=True)
-            except:
-                detected_mime = mimetypes.guess_type(file.filename)[0] or 'application/octet-stream'
-        else:
-            detected_mime = mimetypes.guess_type(file.filename)[0] or 'application/octet-stream'
+        detected_mime = next(
+            (mime for signature, mime in MAGIC_SIGNATURES if file_content.startswith(signature)),
+            None
+        )
+        if detected_mime is None and HAS_MAGIC and magic:
+            detected_mime = magic_mime_from_header(file_content)
+        if detected_mime is None:
+            detected_mime = guess_mime_for_extension(file_ext)
 
         # Validate MIME type matches extension
-        expected_mimes = {
-            '.pdf': 'application/pdf',
-            '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.doc': 'application/msword',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        }
-
-        if file_ext in expected_mimes and not detected_mime.startswith(expected_mimes[file_ext].split('/')[0]):
+        if not detected_mime.startswith(expected_prefix):
             raise HTTPException(
                 status_code=400,
                 detail="File content doesn't match file extension"
@@ -139,33 +271,28 @@ class HIPAAFileHandler:
         """Automatically categorize file based on name and type"""
         filename_lower = filename.lower()
 
-        # Medical records keywords
-        medical_keywords = ['medical', 'record', 'diagnosis', 'treatment', 'prescription', 'lab', 'xray', 'mri', 'ct']
-        if any(keyword in filename_lower for keyword in medical_keywords):
-            return 'medical_record'
-
-        # Service records keywords
-        service_keywords = ['service', 'military', 'dd214', 'discharge', 'veteran']
-        if any(keyword in filename_lower for keyword in service_keywords):
-            return 'service_record'
+        # Medical records, then service records keywords
+        for category, pattern in CATEGORY_KEYWORD_PATTERNS:
+            if pattern.search(filename_lower):
+                return category
 
         # Image files
-        if mime_type.startswith('image/'):
-            return 'photo'
+        if mime_type.startswith(IMAGE_MIME_PREFIXES):
+            return FileCategory.PHOTO.value
 
         # Document files
-        if mime_type in ['application/pdf', 'application/msword', 'text/plain']:
-            return 'document'
+        if mime_type in DOCUMENT_MIME_TYPES:
+            return FileCategory.DOCUMENT.value
 
-        return 'other'
+        return FileCategory.OTHER.value
 
-    def extract_metadata(self, file_path: Path, mime_type: str) -> FileMetadata:
-        """Extract metadata from uploaded file"""
+    def extract_metadata(self, source, mime_type: str) -> FileMetadata:
+        """Extract metadata from an uploaded file path or in-memory file head"""
         metadata = FileMetadata()
 
         try:
-            if mime_type.startswith('image/'):
-                with Image.open(file_path) as img:
+            if mime_type.startswith(IMAGE_MIME_PREFIXES):
+                with Image.open(source) as img:
                     metadata.width = img.width
                     metadata.height = img.height
 
@@ -179,13 +306,180 @@ class HIPAAFileHandler:
             # This would require additional libraries like PyPDF2
 
         except Exception as e:
-            logger.warning(f"Failed to extract metadata from {file_path}: {e}")
+            logger.warning(f"Failed to extract metadata from {source}: {e}")
 
         return metadata
 
+    def find_stored_duplicate(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Stored copy of an active non-PHI upload with the same content"""
+        response = self.supabase.table('file_uploads')\
+            .select('stored_filename, file_path')\
+            .eq('content_hash', content_hash)\
+            .eq('is_phi', False)\
+            .neq('upload_status', 'deleted')\
+            .limit(1)\
+            .execute()
+        if response.data and Path(response.data[0]['file_path']).exists():
+            return response.data[0]
+        return None
+
+    def is_stored_file_shared(self, stored_filename: str) -> bool:
+        """Whether any active upload still references a stored file"""
+        response = self.supabase.table('file_uploads')\
+            .select('id')\
+            .eq('stored_filename', stored_filename)\
+            .neq('upload_status', 'deleted')\
+            .limit(1)\
+            .execute()
+        return bool(response.data)
+
+    def log_file_access(self, file_id: str, access_type: str, request: Request):
+        """Queue a file_access_logs row; rows are inserted in batches"""
+        self.access_log_writer.put({
+            'file_id': file_id,
+            'access_type': access_type,
+            'accessed_by_ip': request.client.host,
+            'accessed_by_user_agent': request.headers.get('user-agent', '')
+        })
+
+    async def flush_logs(self):
+        """Write any queued audit and file access rows"""
+        await self.audit_logger.db_writer.flush()
+        await self.access_log_writer.flush()
+
+    @staticmethod
+    async def _stream_to_disk(file: UploadFile, file_path: Path, stored_filename: str,
+                              is_phi: bool, hasher) -> tuple[int, bytes]:
+        """Stream an upload to disk in chunks, hashing and counting in the same pass.
+
+        PHI chunks are written as length-prefixed AES-GCM frames bound to the
+        stored filename and frame index, the last one marked final. Returns
+        (size, first plaintext chunk); stops early once the size passes
+        MAX_FILE_SIZE.
+        """
+        file_size = 0
+        frame_index = 0
+        head = b''
+        pending = None  # held back until it is known whether it is the last frame
+        with open(file_path, 'wb', buffering=UPLOAD_CHUNK_SIZE) as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    break
+                hasher.update(chunk)
+                if not head:
+                    head = chunk
+                if is_phi:
+                    if pending is not None:
+                        HIPAAFileHandler._write_phi_frame(f, stored_filename, frame_index, pending)
+                        frame_index += 1
+                    pending = chunk
+                else:
+                    f.write(chunk)
+            if is_phi:
+                # Empty uploads still get a (final) frame, so any truncation is detectable
+                HIPAAFileHandler._write_phi_frame(
+                    f, stored_filename, frame_index, pending or b'', final=True
+                )
+        return file_size, head
+
+    @staticmethod
+    def _write_phi_frame(f, stored_filename: str, frame_index: int, chunk: bytes,
+                         final: bool = False):
+        frame = hipaa_compliance.encryption.encrypt_phi_bytes(
+            chunk, HIPAAFileHandler._frame_aad(stored_filename, frame_index, final)
+        )
+        f.write(PHI_FRAME_HEADER.pack(len(frame)))
+        f.write(frame)
+
+    @staticmethod
+    def _copy_to_disk(src_fd: int, file_path: Path, hasher) -> tuple[int, bytes]:
+        """Copy a disk-backed upload with copy_file_range, hashing it via mmap.
+
+        Returns (size, first chunk); nothing is written past MAX_FILE_SIZE.
+        Raises OSError when the kernel cannot copy, so the caller can stream instead.
+        """
+        file_size = os.fstat(src_fd).st_size
+        if file_size > MAX_FILE_SIZE:
+            return file_size, b''
+
+        with open(file_path, 'wb') as dst:
+            offset = 0
+            while offset < file_size:
+                copied = os.copy_file_range(
+                    src_fd, dst.fileno(), file_size - offset, offset, offset
+                )
+                if not copied:
+                    raise OSError("copy_file_range stopped early")
+                offset += copied
+
+        if not file_size:
+            return 0, b''
+        with mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ) as mm:
+            hasher.update(mm)
+            head = mm[:UPLOAD_CHUNK_SIZE]
+        return file_size, head
+
+    def _release_stored_file(self, file_path: Path, stored_filename: str):
+        """Securely delete a stored file, unless another upload still shares it.
+
+        The file is moved aside before the sharing check, so an upload that
+        reuses it after the check finds it gone and keeps its own copy.
+        """
+        released_path = file_path.with_name(file_path.name + '.deleting')
+        try:
+            file_path.rename(released_path)
+        except FileNotFoundError:
+            return
+        if self.is_stored_file_shared(stored_filename):
+            released_path.rename(file_path)
+        else:
+            # Overwrite file with random data for secure deletion
+            self._overwrite_with_random(released_path)
+            released_path.unlink()
+
+    @staticmethod
+    def _overwrite_with_random(file_path: Path):
+        """Overwrite a file in place with a ChaCha20 keystream, 1MB at a time"""
+        remaining = file_path.stat().st_size
+        keystream = Cipher(algorithms.ChaCha20(os.urandom(32), os.urandom(16)), mode=None).encryptor()
+        zeros = bytes(UPLOAD_CHUNK_SIZE)
+        with open(file_path, 'r+b', buffering=0) as f:
+            while remaining:
+                n = min(UPLOAD_CHUNK_SIZE, remaining)
+                f.write(keystream.update(zeros[:n]))
+                remaining -= n
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _frame_aad(stored_filename: str, frame_index: int, final: bool = False) -> bytes:
+        """Associated data binding an encrypted frame to its file, position and
+        whether it ends the stream"""
+        return f"{stored_filename}:{frame_index}{':final' if final else ''}".encode()
+
+    @staticmethod
+    def _read_phi_frames(f, stored_filename: str):
+        """Yield decrypted chunks from a length-prefixed PHI frame stream.
+
+        Only the last frame is authenticated as final, so a stream cut short
+        at a frame boundary fails to decrypt rather than yielding less data.
+        """
+        frame_index = 0
+        header = f.read(PHI_FRAME_HEADER.size)
+        if not header:
+            raise ValueError("Invalid encrypted data")
+        while header:
+            (frame_length,) = PHI_FRAME_HEADER.unpack(header)
+            frame = f.read(frame_length)
+            header = f.read(PHI_FRAME_HEADER.size)
+            yield hipaa_compliance.encryption.decrypt_phi_bytes(
+                frame, HIPAAFileHandler._frame_aad(stored_filename, frame_index, final=not header)
+            )
+            frame_index += 1
+
     def generate_secure_filename(self, original_filename: str, file_category: str) -> str:
         """Generate secure filename for storage"""
-        file_ext = Path(original_filename).suffix.lower()
+        file_ext = file_extension(original_filename)
         secure_name = f"{uuid.uuid4().hex}{file_ext}"
         return f"{file_category}/{secure_name}"
 
@@ -215,20 +509,46 @@ class HIPAAFileHandler:
             file_path = UPLOAD_DIRECTORY / stored_filename
             file_path.parent.mkdir(parents=True, exist_ok=True)
 
-            # Save file to disk
-            content = await file.read()
-
-            # Encrypt file if it contains PHI
-            if is_phi:
-                encrypted_content = encryption.encrypt_phi(content.decode('latin1') if isinstance(content, bytes) else content)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(encrypted_content)
-            else:
-                with open(file_path, 'wb') as f:
-                    f.write(content)
+            # Write file to disk. Plain uploads the server already spooled to a
+            # temp file are copied in-kernel; everything else is streamed.
+            hash_algorithm, hasher = new_content_hasher(is_phi)
+            src_fd = None if is_phi else _spooled_fileno(file.file)
+            try:
+                if src_fd is None:
+                    raise OSError("upload is not disk-backed")
+                file_size, head = await asyncio.to_thread(
+                    self._copy_to_disk, src_fd, file_path, hasher
+                )
+            except OSError:
+                await file.seek(0)
+                file_size, head = await self._stream_to_disk(
+                    file, file_path, stored_filename, is_phi, hasher
+                )
+
+            if file_size > MAX_FILE_SIZE:
+                file_path.unlink(missing_ok=True)
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB"
+                )
+
+            # Extract metadata from the plaintext head already in memory rather
+            # than re-reading (or, for PHI, failing to parse) the stored file.
+            # PIL parsing runs in a worker thread to keep the event loop free.
+            metadata = await asyncio.to_thread(
+                self.extract_metadata, io.BytesIO(head), validation_result['mime_type']
+            )
+            content_hash = f"{hash_algorithm}:{hasher.hexdigest()}"
 
-            # Extract metadata
-            metadata = self.extract_metadata(file_path, validation_result['mime_type'])
+            # Identical non-PHI uploads share one stored copy. PHI is never
+            # shared, so deleting one upload always wipes its plaintext's only copy.
+            own_stored_filename, own_file_path = stored_filename, file_path
+            existing = None if is_phi else await asyncio.to_thread(
+                self.find_stored_duplicate, content_hash
+            )
+            if existing and existing['file_path'] != str(file_path):
+                stored_filename = existing['stored_filename']
+                file_path = Path(existing['file_path'])
 
             # Create database record
             file_record = {
@@ -236,7 +556,7 @@ class HIPAAFileHandler:
                 'original_filename': file.filename,
                 'stored_filename': stored_filename,
                 'file_path': str(file_path),
-                'file_size': len(content),
+                'file_size': file_size,
                 'mime_type': validation_result['mime_type'],
                 'file_category': file_category,
                 'upload_source': upload_source,
@@ -246,15 +566,31 @@ class HIPAAFileHandler:
                 'uploaded_by_user_agent': request.headers.get('user-agent', ''),
                 'upload_status': 'uploaded',
                 'metadata': metadata.model_dump(),
-                'created_at': datetime.now(timezone.utc).isoformat()
+                'content_hash': content_hash,
+                'created_at': utc_now_iso()
             }
 
-            # Insert into database
-            response = self.supabase.table('file_uploads').insert(file_record).execute()
+            # Insert into database; the row is already known, so skip echoing it back
+            self.supabase.table('file_uploads').insert(
+                file_record, returning=ReturnMethod.minimal
+            ).execute()
+
+            if file_path != own_file_path:
+                if file_path.exists():
+                    own_file_path.unlink(missing_ok=True)
+                else:
+                    # The shared copy was deleted before this row referenced it
+                    # (see delete_file), so keep the copy just written
+                    await asyncio.to_thread(
+                        self.supabase.table('file_uploads').update({
+                            'stored_filename': own_stored_filename,
+                            'file_path': str(own_file_path)
+                        }, returning=ReturnMethod.minimal).eq('id', file_record['id']).execute
+                    )
 
             # Log file upload for HIPAA compliance
             audit_log = AuditLog(
-                timestamp=datetime.now(timezone.utc).isoformat(),
+                timestamp=utc_now_iso(),
                 event_type=AuditEventType.PHI_CREATE if is_phi else AuditEventType.SYSTEM_ACCESS,
                 ip_address=request.client.host,
                 user_agent=request.headers.get('user-agent', ''),
@@ -265,7 +601,7 @@ class HIPAAFileHandler:
                 phi_involved=is_phi,
                 details={
                     'file_category': file_category,
-                    'file_size': len(content),
+                    'file_size': file_size,
                     'mime_type': validation_result['mime_type']
                 }
             )
@@ -274,7 +610,7 @@ class HIPAAFileHandler:
             return FileUploadResponse(
                 id=file_record['id'],
                 original_filename=file.filename,
-                file_size=len(content),
+                file_size=file_size,
                 mime_type=validation_result['mime_type'],
                 file_category=file_category,
                 upload_status='uploaded',
@@ -289,7 +625,7 @@ class HIPAAFileHandler:
 
             # Log failed upload
             audit_log = AuditLog(
-                timestamp=datetime.now(timezone.utc).isoformat(),
+                timestamp=utc_now_iso(),
                 event_type=AuditEventType.SYSTEM_ACCESS,
                 ip_address=request.client.host,
                 user_agent=request.headers.get('user-agent', ''),
@@ -303,8 +639,8 @@ class HIPAAFileHandler:
 
             raise HTTPException(status_code=500, detail="File upload failed")
 
-    async def get_file(self, file_id: str, request: Request) -> Dict[str, Any]:
-        """Retrieve file information"""
+    async def get_file(self, file_id: str, request: Request, access_type: str = 'view') -> Dict[str, Any]:
+        """Retrieve file information, logging it as the given access type"""
         try:
             response = self.supabase.table('file_uploads').select('*').eq('id', file_id).execute()
 
@@ -314,12 +650,7 @@ class HIPAAFileHandler:
             file_record = response.data[0]
 
             # Log file access
-            self.supabase.rpc('log_file_access', {
-                'p_file_id': file_id,
-                'p_access_type': 'view',
-                'p_user_ip': request.client.host,
-                'p_user_agent': request.headers.get('user-agent', '')
-            }).execute()
+            self.log_file_access(file_id, access_type, request)
 
             return file_record
 
@@ -332,7 +663,7 @@ class HIPAAFileHandler:
     async def download_file(self, file_id: str, request: Request) -> tuple[bytes, str, str]:
         """Download file content"""
         try:
-            file_record = await self.get_file(file_id, request)
+            file_record = await self.get_file(file_id, request, access_type='download')
             file_path = Path(file_record['file_path'])
 
             if not file_path.exists():
@@ -340,22 +671,25 @@ class HIPAAFileHandler:
 
             # Read file content
             if file_record['is_phi']:
-                # Decrypt PHI file
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    encrypted_content = f.read()
-                content = encryption.decrypt_phi(encrypted_content).encode('latin1')
+                # Decrypt PHI file frame by frame
+                with open(file_path, 'rb') as f:
+                    prefix = f.read(len(LEGACY_PHI_PREFIX))
+                    if prefix == LEGACY_PHI_PREFIX:
+                        # Uploaded before frame encryption: one Fernet token of latin1 text
+                        f.seek(0)
+                        content = hipaa_compliance.encryption.decrypt_phi(f.read().decode('utf-8')).encode('latin1')
+                    elif not prefix and file_record['file_size'] == 0:
+                        # Empty uploads were stored as empty files before frame encryption
+                        content = b''
+                    else:
+                        f.seek(0)
+                        content = b''.join(
+                            self._read_phi_frames(f, file_record['stored_filename'])
+                        )
             else:
                 with open(file_path, 'rb') as f:
                     content = f.read()
 
-            # Log download
-            self.supabase.rpc('log_file_access', {
-                'p_file_id': file_id,
-                'p_access_type': 'download',
-                'p_user_ip': request.client.host,
-                'p_user_agent': request.headers.get('user-agent', '')
-            }).execute()
-
             return content, file_record['original_filename'], file_record['mime_type']
 
         except HTTPException:
@@ -367,26 +701,27 @@ class HIPAAFileHandler:
     async def delete_file(self, file_id: str, request: Request) -> bool:
         """Securely delete file"""
         try:
-            file_record = await self.get_file(file_id, request)
-            file_path = Path(file_record['file_path'])
-
-            # Mark as deleted in database
-            self.supabase.table('file_uploads').update({
+            # Mark as deleted in database; the updated row comes back in the same request
+            response = self.supabase.table('file_uploads').update({
                 'upload_status': 'deleted',
-                'deleted_at': datetime.now(timezone.utc).isoformat()
+                'deleted_at': utc_now_iso()
             }).eq('id', file_id).execute()
 
-            # Securely delete file from disk
-            if file_path.exists():
-                # Overwrite file with random data for secure deletion
-                file_size = file_path.stat().st_size
-                with open(file_path, 'wb') as f:
-                    f.write(os.urandom(file_size))
-                file_path.unlink()
+            if not response.data:
+                raise HTTPException(status_code=404, detail="File not found")
+
+            file_record = response.data[0]
+            file_path = Path(file_record['file_path'])
+            self.log_file_access(file_id, 'delete', request)
+
+            # The sharing check and the wipe run in a worker thread
+            await asyncio.to_thread(
+                self._release_stored_file, file_path, file_record['stored_filename']
+            )
 
             # Log deletion
             audit_log = AuditLog(
-                timestamp=datetime.now(timezone.utc).isoformat(),
+                timestamp=utc_now_iso(),
                 event_type=AuditEventType.PHI_DELETE if file_record['is_phi'] else AuditEventType.SYSTEM_ACCESS,
                 ip_address=request.client.host,
                 user_agent=request.headers.get('user-agent', ''),
@@ -410,11 +745,16 @@ class HIPAAFileHandler:
         self,
         contact_id: Optional[str] = None,
         file_category: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """List uploaded files with filters"""
+        """List uploaded files with filters, newest first.
+
+        Pass file_list_cursor() of the last file of a page as cursor to get
+        the next page.
+        """
         try:
-            query = self.supabase.table('file_uploads').select('*')
+            query = self.supabase.table('file_uploads').select(FILE_LIST_COLUMNS)
 
             if contact_id:
                 query = query.eq('contact_id', contact_id)
@@ -423,11 +763,26 @@ class HIPAAFileHandler:
                 query = query.eq('file_category', file_category)
 
             query = query.neq('upload_status', 'deleted')
-            query = query.order('created_at', desc=True).limit(limit)
+            if cursor:
+                created_at, _, last_id = cursor.partition(',')
+                try:
+                    datetime.fromisoformat(created_at)
+                    uuid.UUID(last_id)
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+                # Keyset on (created_at, id), so files sharing the last
+                # timestamp of a page are not skipped
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt.{last_id})'
+                )
+            query = query.order('created_at', desc=True).order('id', desc=True).limit(limit)
 
             response = query.execute()
             return response.data
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to list files: {e}")
             raise HTTPException(status_code=500, detail="Failed to list files")
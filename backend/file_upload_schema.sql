@@ -21,11 +21,15 @@ CREATE TABLE IF NOT EXISTS file_uploads (
     virus_scan_status TEXT DEFAULT 'pending' CHECK (virus_scan_status IN ('pending', 'clean', 'infected', 'error')),
     virus_scan_result JSONB,
     metadata JSONB DEFAULT '{}',
+    content_hash TEXT, -- '<algorithm>:<hex digest>' of the plaintext (keyed for PHI), for dedup
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     deleted_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Existing deployments: add the dedup column
+ALTER TABLE file_uploads ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
 -- File Access Log Table (for HIPAA compliance)
 CREATE TABLE IF NOT EXISTS file_access_logs (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -62,6 +66,16 @@ CREATE INDEX IF NOT EXISTS idx_file_uploads_category ON file_uploads(file_catego
 CREATE INDEX IF NOT EXISTS idx_file_uploads_status ON file_uploads(upload_status);
 CREATE INDEX IF NOT EXISTS idx_file_uploads_created_at ON file_uploads(created_at);
 CREATE INDEX IF NOT EXISTS idx_file_uploads_is_phi ON file_uploads(is_phi);
+-- Serves list_files: newest active uploads per contact, without scanning deleted rows,
+-- in the (created_at, id) keyset order its cursor pages through
+DROP INDEX IF EXISTS idx_file_uploads_active_contact_created;
+CREATE INDEX IF NOT EXISTS idx_file_uploads_active_contact_created_id
+    ON file_uploads(contact_id, created_at DESC, id DESC) WHERE upload_status <> 'deleted';
+-- Serves upload dedup lookups and shared-copy checks on delete
+CREATE INDEX IF NOT EXISTS idx_file_uploads_active_content_hash
+    ON file_uploads(content_hash) WHERE upload_status <> 'deleted';
+CREATE INDEX IF NOT EXISTS idx_file_uploads_active_stored_filename
+    ON file_uploads(stored_filename) WHERE upload_status <> 'deleted';
 
 CREATE INDEX IF NOT EXISTS idx_file_access_logs_file_id ON file_access_logs(file_id);
 CREATE INDEX IF NOT EXISTS idx_file_access_logs_created_at ON file_access_logs(created_at);
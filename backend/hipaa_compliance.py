@@ -9,15 +9,30 @@ This module implements HIPAA compliance measures including:
 - Security measures
 """
 
+import asyncio
+import atexit
 import logging
+from logging.handlers import MemoryHandler
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, List, Mapping
+from types import MappingProxyType
+from functools import lru_cache
+from collections import defaultdict, deque
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import base64
+import hashlib
 import os
-from pydantic import BaseModel
+import re
+from dataclasses import dataclass, asdict
+from timestamps import utc_now_iso
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
 from enum import Enum
 
 
@@ -35,40 +50,89 @@ class AuditEventType(str, Enum):
     SYSTEM_ACCESS = "system_access"
 
 
-class AuditLog(BaseModel):
-    """HIPAA Audit Log Entry"""
+@dataclass
+class AuditLog:
+    """HIPAA Audit Log Entry
+
+    A plain dataclass rather than a Pydantic model: entries are only built
+    internally, so per-event validation buys nothing on the hot path.
+    """
     timestamp: str
     event_type: AuditEventType
+    action: str
+    outcome: str  # SUCCESS, FAILURE, WARNING
     user_id: Optional[str] = None
     user_email: Optional[str] = None
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
     resource_type: Optional[str] = None
     resource_id: Optional[str] = None
-    action: str
-    outcome: str  # SUCCESS, FAILURE, WARNING
     details: Optional[Dict[str, Any]] = None
     phi_involved: bool = False
 
 
+# Password-based key derivation for HIPAA_ENCRYPTION_KEY
+PBKDF2_SALT = b'hipaa_salt_2024'  # In production, use random salt per encryption
+PBKDF2_ITERATIONS = 100000
+
+
+@lru_cache(maxsize=16)
+def _derive_master_key(password: bytes, salt: bytes, iterations: int) -> bytes:
+    """PBKDF2 master key; memoized so repeated HIPAAEncryption() calls derive once"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+    )
+    return kdf.derive(password)
+
+
 class HIPAAEncryption:
     """HIPAA-compliant encryption utilities"""
 
-    def __init__(self, password: str = None):
-        if password is None:
-            password = os.environ.get('HIPAA_ENCRYPTION_KEY', 'default-key-change-in-production')
+    def __init__(self, password: str = None, key: str = None):
+        if key is None and password is None:
+            key = os.environ.get('HIPAA_FERNET_KEY')
+
+        if key:
+            # Pre-generated 32-byte key (urlsafe base64): no key stretching needed
+            master_key = base64.urlsafe_b64decode(key)
+            if len(master_key) != 32:
+                raise ValueError("HIPAA_FERNET_KEY must be 32 url-safe base64-encoded bytes")
+        else:
+            if password is None:
+                password = os.environ.get('HIPAA_ENCRYPTION_KEY', 'default-key-change-in-production')
+
+            # Generate key from password (kept so existing ciphertext stays readable)
+            master_key = _derive_master_key(password.encode(), PBKDF2_SALT, PBKDF2_ITERATIONS)
+
+        key = base64.urlsafe_b64encode(master_key)
+        self.cipher_suite = Fernet(key)
 
-        # Generate key from password
-        password_bytes = password.encode()
-        salt = b'hipaa_salt_2024'  # In production, use random salt per encryption
-        kdf = PBKDF2HMAC(
+        # Separate AES-256-GCM key for binary file content
+        file_key = HKDF(
             algorithm=hashes.SHA256(),
             length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password_bytes))
-        self.cipher_suite = Fernet(key)
+            salt=None,
+            info=b'hipaa_file_aead',
+        ).derive(master_key)
+        self.file_cipher = AESGCM(file_key)
+
+        # Pepper for keyed index hashes, so tokens can't be brute-forced offline
+        self._pepper = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b'hipaa_phi_index',
+        ).derive(master_key)
+
+    @staticmethod
+    def export_key(password: str) -> str:
+        """HIPAA_FERNET_KEY value equivalent to a HIPAA_ENCRYPTION_KEY password"""
+        return base64.urlsafe_b64encode(
+            _derive_master_key(password.encode(), PBKDF2_SALT, PBKDF2_ITERATIONS)
+        ).decode()
 
     def encrypt_phi(self, data: str) -> str:
         """Encrypt PHI data"""
@@ -86,11 +150,197 @@ class HIPAAEncryption:
             logging.error(f"Failed to decrypt PHI data: {e}")
             raise ValueError("Invalid encrypted data")
 
+    def encrypt_phi_bytes(self, data: bytes, associated_data: bytes = None) -> bytes:
+        """Encrypt binary PHI with AES-GCM, returning nonce || ciphertext"""
+        nonce = os.urandom(12)
+        return nonce + self.file_cipher.encrypt(nonce, data, associated_data)
+
+    def decrypt_phi_bytes(self, encrypted_data: bytes, associated_data: bytes = None) -> bytes:
+        """Decrypt binary PHI produced by encrypt_phi_bytes"""
+        try:
+            return self.file_cipher.decrypt(encrypted_data[:12], encrypted_data[12:], associated_data)
+        except Exception as e:
+            logging.error(f"Failed to decrypt PHI data: {e}")
+            raise ValueError("Invalid encrypted data")
+
     def hash_phi(self, data: str) -> str:
-        """Create irreversible hash of PHI for indexing"""
+        """Create irreversible keyed hash (BLAKE2b-256) of PHI for indexing"""
         if not data:
             return data
-        return hashlib.sha256(data.encode()).hexdigest()
+        hasher = self.phi_hasher()
+        hasher.update(data.encode())
+        return hasher.hexdigest()
+
+    def phi_hasher(self):
+        """Incremental keyed BLAKE2b-256 hasher, the same keyed hash as hash_phi"""
+        return hashlib.blake2b(digest_size=32, key=self._pepper)
+
+
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_FILL = 0.3  # flush early once the buffer is this full...
+AUDIT_MAX_AGE = 1.0  # ...or its oldest row has waited this many seconds
+AUDIT_MAX_BUFFER = 10000  # rows held while the database is unreachable
+AUDIT_MAX_BACKOFF = 30.0  # longest wait between attempts to reach it
+
+
+def _rows_rejected(error: Exception) -> bool:
+    """Whether a failed write was refused because of its rows, rather than
+    because the database could not be reached"""
+    if not isinstance(error, APIError):
+        return False  # transport error or timeout
+    code = str(error.code or '')
+    # Non-JSON gateway errors carry their HTTP status; PGRST0xx are PostgREST connection errors
+    return not (len(code) == 3 and code >= '500') and not code.startswith('PGRST0')
+
+
+class BatchWriter:
+    """Buffer rows and write them in bulk from a background thread.
+
+    Small batches are avoided: the writer only wakes once the buffer is
+    AUDIT_FLUSH_FILL full or its oldest row is AUDIT_MAX_AGE old, then
+    writes up to batch_size rows. The daemon thread starts on the first
+    put(), so forked workers each get their own; close() (also run at
+    exit) drains it.
+
+    A batch the database rejects is retried row by row, so only the bad
+    rows are dropped (and logged). A batch that could not be delivered is
+    requeued and retried with exponential backoff; meanwhile at most
+    max_buffer rows are held and the rest are dropped and counted.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Any]], None], name: str,
+                 batch_size: int = AUDIT_BATCH_SIZE, fill: float = AUDIT_FLUSH_FILL,
+                 max_age: float = AUDIT_MAX_AGE, max_buffer: int = AUDIT_MAX_BUFFER):
+        self.write_batch = write_batch
+        self.name = name
+        self.batch_size = batch_size
+        self.fill_threshold = max(1, int(batch_size * fill))
+        self.max_age = max_age
+        self.max_buffer = max_buffer
+        self.dropped = 0  # rows refused since the buffer last filled up
+        self._buffer: deque = deque()  # (enqueued_at, row)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        atexit.register(self.close)
+
+    def put(self, row: Any):
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                if self.dropped == 1:
+                    logging.getLogger('hipaa_audit').critical(
+                        f"AUDIT BUFFER FULL ({self.name}, {self.max_buffer} rows): dropping new rows"
+                    )
+                return
+            self._buffer.append((time.monotonic(), row))
+            # The first row starts the max_age clock; reaching the fill threshold ends it early
+            if len(self._buffer) == 1 or len(self._buffer) >= self.fill_threshold:
+                self._cond.notify()
+
+    def _start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"batch-writer-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    def _write(self, batch: List[Any]) -> List[Any]:
+        """Write a batch, returning the rows that could not be delivered"""
+        try:
+            self.write_batch(batch)
+            return []
+        except Exception as e:
+            if not _rows_rejected(e):
+                logging.getLogger('hipaa_audit').warning(
+                    f"Audit batch insert failed ({self.name}, {len(batch)} rows), will retry: {e}"
+                )
+                return batch
+            if len(batch) == 1:
+                # Critical: audit logging must not fail
+                logging.getLogger('hipaa_audit').critical(
+                    f"AUDIT LOGGING FAILED ({self.name}, 1 row): {e}"
+                )
+                return []
+            logging.getLogger('hipaa_audit').warning(
+                f"Audit batch insert failed ({self.name}, {len(batch)} rows), retrying row by row: {e}"
+            )
+
+        # One bad row must not take the rest of its batch down with it
+        for i, row in enumerate(batch):
+            if self._write([row]):
+                return batch[i:]
+        return []
+
+    def _requeue(self, rows: List[Any]):
+        """Put undelivered rows back at the front of the buffer, due immediately"""
+        due = time.monotonic() - self.max_age
+        with self._cond:
+            self._buffer.extendleft((due, row) for row in reversed(rows))
+
+    def _drop_unsent(self, rows: List[Any]):
+        """Give up on rows that cannot be delivered before shutdown"""
+        with self._cond:
+            count = len(rows) + len(self._buffer)
+            self._buffer.clear()
+        logging.getLogger('hipaa_audit').critical(
+            f"AUDIT LOGGING FAILED ({self.name}, {count} rows): database unreachable at shutdown"
+        )
+
+    def _next_batch(self) -> Optional[List[Any]]:
+        """Wait until a batch is due; None once stopping with nothing left"""
+        with self._cond:
+            while True:
+                if not self._buffer:
+                    if self._stopping:
+                        return None
+                    self._cond.wait()
+                    continue
+                age = time.monotonic() - self._buffer[0][0]
+                if self._stopping or len(self._buffer) >= self.fill_threshold or age >= self.max_age:
+                    count = min(self.batch_size, len(self._buffer))
+                    return [self._buffer.popleft()[1] for _ in range(count)]
+                self._cond.wait(timeout=self.max_age - age)
+
+    def _run(self):
+        backoff = self.max_age
+        while (batch := self._next_batch()) is not None:
+            unsent = self._write(batch)
+            if not unsent:
+                backoff = self.max_age
+                with self._cond:
+                    dropped, self.dropped = self.dropped, 0
+                if dropped:
+                    logging.getLogger('hipaa_audit').critical(
+                        f"AUDIT LOGGING FAILED ({self.name}, {dropped} rows): dropped while the buffer was full"
+                    )
+                continue
+            if self._stopping:
+                self._drop_unsent(unsent)
+                continue
+            self._requeue(unsent)
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping, timeout=backoff)
+            backoff = min(backoff * 2, AUDIT_MAX_BACKOFF)
+
+    def close(self):
+        """Write anything still buffered and stop the writer thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        thread.join()
+        self._stopping = False
+
+    async def flush(self):
+        """close() without blocking the event loop"""
+        await asyncio.to_thread(self.close)
 
 
 class HIPAAAuditLogger:
@@ -99,6 +349,13 @@ class HIPAAAuditLogger:
     def __init__(self, supabase_client):
         self.supabase = supabase_client
         self.logger = logging.getLogger('hipaa_audit')
+        # AuditLog objects are queued as-is and dumped in the writer thread
+        self.db_writer = BatchWriter(
+            lambda logs: self.supabase.table('hipaa_audit_logs').insert(
+                [asdict(log) for log in logs], returning=ReturnMethod.minimal
+            ).execute(),
+            'hipaa_audit_logs'
+        )
 
         # Configure audit logger
         handler = logging.FileHandler('hipaa_audit.log')
@@ -106,8 +363,11 @@ class HIPAAAuditLogger:
             '%(asctime)s - HIPAA_AUDIT - %(levelname)s - %(message)s'
         )
         handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        # Buffer routine events in memory; ERROR (FAILURE outcomes) flushes immediately
+        self.log_buffer = MemoryHandler(capacity=512, flushLevel=logging.ERROR, target=handler)
+        self.logger.addHandler(self.log_buffer)
         self.logger.setLevel(logging.INFO)
+        atexit.register(self.log_buffer.flush)
 
     def log_event(self, audit_log: AuditLog):
         """Log HIPAA audit event"""
@@ -124,9 +384,8 @@ class HIPAAAuditLogger:
             else:
                 self.logger.info(log_message)
 
-            # Store in database for compliance reporting
-            audit_data = audit_log.model_dump()
-            self.supabase.table('hipaa_audit_logs').insert(audit_data).execute()
+            # Store in database for compliance reporting, batched with other events
+            self.db_writer.put(audit_log)
 
         except Exception as e:
             # Critical: audit logging must not fail
@@ -136,7 +395,7 @@ class HIPAAAuditLogger:
                       ip_address: str, user_agent: str = None):
         """Log PHI access event"""
         audit_log = AuditLog(
-            timestamp=datetime.now(timezone.utc).isoformat(),
+            timestamp=utc_now_iso(),
             event_type=AuditEventType.PHI_ACCESS,
             user_email=user_email,
             ip_address=ip_address,
@@ -153,7 +412,7 @@ class HIPAAAuditLogger:
                               user_agent: str = None):
         """Log unauthorized access attempt"""
         audit_log = AuditLog(
-            timestamp=datetime.now(timezone.utc).isoformat(),
+            timestamp=utc_now_iso(),
             event_type=AuditEventType.UNAUTHORIZED_ACCESS,
             ip_address=ip_address,
             user_agent=user_agent,
@@ -164,20 +423,67 @@ class HIPAAAuditLogger:
         self.log_event(audit_log)
 
 
+# Field names treated as PHI when present in a payload
+PHI_FIELDS = frozenset({
+    'name', 'email', 'phone', 'address', 'ssn', 'medical_record_number',
+    'date_of_birth', 'medical_condition', 'diagnosis', 'treatment',
+    'medication', 'doctor_name', 'hospital_name', 'insurance_info'
+})
+
+# Field names redacted before a payload is logged
+PHI_LOGGING_REDACT_FIELDS = frozenset({
+    'name', 'email', 'phone', 'address', 'ssn', 'medical_record_number',
+    'date_of_birth', 'medical_condition', 'diagnosis', 'treatment'
+})
+
+# Value patterns for PHI embedded in free text, compiled into one alternation
+# so a payload is scanned in a single pass
+PHI_VALUE_PATTERNS = {
+    'ssn': rb'(?<!\d)(?!000|666|9\d\d)\d{3}-(?!00)\d{2}-(?!0000)\d{4}(?!\d)',
+    'email': rb'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',
+    'mrn': rb'(?i:\bMRN[\s:#-]*\d{6,10}\b)',
+    'credit_card': rb'(?<!\d)\d(?:[ -]?\d){12,18}(?!\d)',
+    'phone': rb'(?<!\d)(?:\+?1[\s.-]?)?\(?[2-9]\d{2}\)?[\s.-]?[2-9]\d{2}[\s.-]?\d{4}(?!\d)',
+}
+PHI_VALUE_PATTERN = re.compile(
+    b'|'.join(b'(?P<%s>%s)' % (kind.encode(), pattern) for kind, pattern in PHI_VALUE_PATTERNS.items())
+)
+
+
+@lru_cache(maxsize=2048)
+def _fold_field_name(key) -> str:
+    # Payloads of one schema repeat the same keys, so case-folding is cached
+    return str(key).lower()
+
+
+def _luhn_valid(digits: bytes) -> bool:
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        n = digit - 48
+        if i % 2:
+            n = n * 2 - 9 if n > 4 else n * 2
+        total += n
+    return total % 10 == 0
+
+
 class HIPAAValidator:
     """HIPAA compliance validation utilities"""
 
     @staticmethod
     def is_phi_data(data: Dict[str, Any]) -> bool:
         """Check if data contains PHI"""
-        phi_fields = {
-            'name', 'email', 'phone', 'address', 'ssn', 'medical_record_number',
-            'date_of_birth', 'medical_condition', 'diagnosis', 'treatment',
-            'medication', 'doctor_name', 'hospital_name', 'insurance_info'
-        }
+        return any(_fold_field_name(key) in PHI_FIELDS for key in data)
 
-        data_keys = set(str(key).lower() for key in data.keys())
-        return bool(phi_fields.intersection(data_keys))
+    @staticmethod
+    def scan_payload(data: bytes) -> List[str]:
+        """Return the kinds of PHI values (ssn, email, mrn, credit_card, phone) found in a payload"""
+        found = set()
+        for match in PHI_VALUE_PATTERN.finditer(data):
+            kind = match.lastgroup
+            if kind == 'credit_card' and not _luhn_valid(re.sub(rb'[ -]', b'', match.group())):
+                continue
+            found.add(kind)
+        return sorted(found)
 
     @staticmethod
     def validate_minimum_necessary(requested_fields: list, user_role: str) -> list:
@@ -197,16 +503,15 @@ class HIPAAValidator:
         return [field for field in requested_fields if field in allowed_fields]
 
     @staticmethod
-    def sanitize_phi_for_logging(data: Dict[str, Any]) -> Dict[str, Any]:
-        """Remove PHI from data for safe logging"""
-        phi_fields = {
-            'name', 'email', 'phone', 'address', 'ssn', 'medical_record_number',
-            'date_of_birth', 'medical_condition', 'diagnosis', 'treatment'
-        }
-
+    def sanitize_phi_for_logging(data: Dict[str, Any], scan_values: bool = False) -> Dict[str, Any]:
+        """Remove PHI from data for safe logging, by field name and, with
+        scan_values, also from free-text values scan_payload flags"""
         sanitized = {}
         for key, value in data.items():
-            if key.lower() in phi_fields:
+            if _fold_field_name(key) in PHI_LOGGING_REDACT_FIELDS:
+                sanitized[key] = "[PHI_REDACTED]"
+            elif scan_values and isinstance(value, str) and HIPAAValidator.scan_payload(value.encode()):
+                # PHI typed into a free-text field (e.g. an SSN in a message)
                 sanitized[key] = "[PHI_REDACTED]"
             else:
                 sanitized[key] = value
@@ -214,24 +519,28 @@ class HIPAAValidator:
         return sanitized
 
 
+# Shared, read-only header set added to every response
+SECURITY_HEADERS = MappingProxyType({
+    'Strict-Transport-Security': 'max-age=31536000; includeSubDomains',
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+    'Content-Security-Policy': "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'",
+    'Referrer-Policy': 'strict-origin-when-cross-origin',
+    'Permissions-Policy': 'geolocation=(), microphone=(), camera=()',
+    'Cache-Control': 'no-store, no-cache, must-revalidate, private',
+    'Pragma': 'no-cache',
+    'Expires': '0'
+})
+
+
 class HIPAASecurityHeaders:
     """HIPAA-compliant security headers"""
 
     @staticmethod
-    def get_security_headers() -> Dict[str, str]:
-        """Get HIPAA-compliant security headers"""
-        return {
-            'Strict-Transport-Security': 'max-age=31536000; includeSubDomains',
-            'X-Content-Type-Options': 'nosniff',
-            'X-Frame-Options': 'DENY',
-            'X-XSS-Protection': '1; mode=block',
-            'Content-Security-Policy': "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'",
-            'Referrer-Policy': 'strict-origin-when-cross-origin',
-            'Permissions-Policy': 'geolocation=(), microphone=(), camera=()',
-            'Cache-Control': 'no-store, no-cache, must-revalidate, private',
-            'Pragma': 'no-cache',
-            'Expires': '0'
-        }
+    def get_security_headers() -> Mapping[str, str]:
+        """Get HIPAA-compliant security headers (read-only; copy before modifying)"""
+        return SECURITY_HEADERS
 
 
 class HIPAADataRetention:
@@ -243,23 +552,34 @@ class HIPAADataRetention:
     def schedule_data_deletion(self, table_name: str, record_id: str,
                              retention_years: int = 6):
         """Schedule data for deletion per HIPAA retention requirements"""
-        deletion_date = datetime.now(timezone.utc).replace(
-            year=datetime.now().year + retention_years
-        ).isoformat()
+        now = datetime.now(timezone.utc)
+        try:
+            deletion_date = now.replace(year=now.year + retention_years)
+        except ValueError:
+            # Feb 29 scheduled into a non-leap year rolls forward to Mar 1
+            deletion_date = now.replace(year=now.year + retention_years, month=3, day=1)
 
         retention_record = {
             'table_name': table_name,
             'record_id': record_id,
-            'scheduled_deletion_date': deletion_date,
-            'created_at': datetime.now(timezone.utc).isoformat(),
+            'scheduled_deletion_date': deletion_date.isoformat(),
+            'created_at': now.isoformat(),
             'status': 'scheduled'
         }
 
-        self.supabase.table('hipaa_data_retention').insert(retention_record).execute()
+        self.supabase.table('hipaa_data_retention').insert(
+            retention_record, returning=ReturnMethod.minimal
+        ).execute()
+
+    def _delete_records(self, table_name: str, record_ids: List[str]):
+        self.supabase.table(table_name)\
+            .delete(returning=ReturnMethod.minimal)\
+            .in_('id', record_ids)\
+            .execute()
 
     def execute_scheduled_deletions(self):
         """Execute scheduled data deletions"""
-        current_date = datetime.now(timezone.utc).isoformat()
+        current_date = utc_now_iso()
 
         # Get records scheduled for deletion
         response = self.supabase.table('hipaa_data_retention')\
@@ -268,27 +588,59 @@ class HIPAADataRetention:
             .lte('scheduled_deletion_date', current_date)\
             .execute()
 
+        # Group due records so each table costs one delete round-trip
+        due_by_table = defaultdict(list)
         for record in response.data:
-            try:
-                # Delete the actual data
-                self.supabase.table(record['table_name'])\
-                    .delete()\
-                    .eq('id', record['record_id'])\
-                    .execute()
-
-                # Mark retention record as completed
-                self.supabase.table('hipaa_data_retention')\
-                    .update({'status': 'completed', 'deleted_at': current_date})\
-                    .eq('id', record['id'])\
-                    .execute()
-
-                logging.info(f"HIPAA: Deleted record {record['record_id']} from {record['table_name']}")
+            due_by_table[record['table_name']].append(record)
 
+        completed_ids = []
+        for table_name, records in due_by_table.items():
+            record_ids = [record['record_id'] for record in records]
+            try:
+                self._delete_records(table_name, record_ids)
             except Exception as e:
-                logging.error(f"HIPAA: Failed to delete record {record['record_id']}: {e}")
+                # One bad id must not hold back the rest of the table: retry each record
+                logging.error(f"HIPAA: Failed to delete {len(record_ids)} records from {table_name}, "
+                              f"retrying one by one: {e}")
+                for record in records:
+                    try:
+                        self._delete_records(table_name, [record['record_id']])
+                    except Exception as e:
+                        logging.error(f"HIPAA: Failed to delete record {record['record_id']}: {e}")
+                        continue
+                    completed_ids.append(record['id'])
+                    logging.info(f"HIPAA: Deleted record {record['record_id']} from {table_name}")
+                continue
+
+            completed_ids.extend(record['id'] for record in records)
+            logging.info(f"HIPAA: Deleted {len(record_ids)} records from {table_name}")
+
+        if not completed_ids:
+            return
+
+        # Mark all deleted records' retention entries as completed at once
+        try:
+            self.supabase.table('hipaa_data_retention')\
+                .update({'status': 'completed', 'deleted_at': current_date},
+                        returning=ReturnMethod.minimal)\
+                .in_('id', completed_ids)\
+                .execute()
+        except Exception as e:
+            logging.error(f"HIPAA: Failed to mark {len(completed_ids)} retention records completed: {e}")
 
 
 # Global instances
-encryption = HIPAAEncryption()
 validator = HIPAAValidator()
 security_headers = HIPAASecurityHeaders()
+_encryption = None
+
+
+def __getattr__(name):
+    # The shared `encryption` instance is built on first use rather than at
+    # import, so importing this module never pays for PBKDF2
+    global _encryption
+    if name == 'encryption':
+        if _encryption is None:
+            _encryption = HIPAAEncryption()
+        return _encryption
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,19 +3,23 @@
 Simple server runner for Dr. Kishan Bhalani Medical Documentation Services
 """
 
-import uvicorn
-import sys
 import os
+import sys
 from pathlib import Path
 
 # Add current directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
+from config import PORT, WEB_CONCURRENCY, UVICORN_LOOP
+
 def main():
     print("🏥 Dr. Kishan Bhalani Medical Documentation Services")
     print("=" * 50)
 
     try:
+        # Workers size their Supabase connection pools from this
+        os.environ['WEB_CONCURRENCY'] = str(WEB_CONCURRENCY)
+
         # Import and start the production server
         import server
         print("✅ Production server loaded successfully")
@@ -29,13 +33,17 @@ def main():
         print("\n💡 Press Ctrl+C to stop the server")
         print("=" * 50)
 
-        # Start the server
-        port = int(os.environ.get("PORT", 8000))
+        # Start the server; uvicorn is only loaded once the app imported cleanly
+        import uvicorn
         uvicorn.run(
             "server:app",
             host="0.0.0.0",
-            port=port,
+            port=PORT,
+            workers=WEB_CONCURRENCY,
             reload=False,  # Disable reload in production
+            # httptools ships with uvicorn[standard]
+            loop=UVICORN_LOOP,
+            http="httptools",
             log_level="info"
         )
 
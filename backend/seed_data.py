@@ -1,14 +1,11 @@
-from supabase import create_client, Client
 import os
-from dotenv import load_dotenv
-from pathlib import Path
+import asyncio
+from config import get_supabase
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-supabase_url = os.environ['SUPABASE_URL']
-supabase_key = os.environ['SUPABASE_KEY']
-supabase: Client = create_client(supabase_url, supabase_key)
+# Rows per insert request, kept well inside PostgREST's payload and statement limits
+SEED_BATCH_SIZE = int(os.environ.get('SEED_BATCH_SIZE', '500'))
+# Insert requests in flight at once across all tables
+SEED_CONCURRENCY = int(os.environ.get('SEED_CONCURRENCY', '8'))
 
 
 SERVICES = [
@@ -254,31 +251,86 @@ BLOG_POSTS = [
 ]
 
 
-def seed_database():
-    print("Starting database seeding...")
+# postgrest (with httpx and pydantic) is imported on first write rather than at
+# import, so reading SERVICES / BLOG_POSTS stays cheap
+def _upsert_rows(table_name, rows):
+    from postgrest.types import ReturnMethod
+    get_supabase().table(table_name).upsert(
+        rows, on_conflict='id', returning=ReturnMethod.minimal
+    ).execute()
 
-    try:
-        # Clear existing data
-        supabase.table('services').delete().neq('id', '').execute()
-        supabase.table('blog_posts').delete().neq('id', '').execute()
-        print("Cleared existing data")
 
-        # Insert services
-        if SERVICES:
-            response = supabase.table('services').insert(SERVICES).execute()
-            print(f"Inserted {len(SERVICES)} services")
+def _prune_rows(table_name, keep_ids):
+    from postgrest.types import ReturnMethod
+    get_supabase().table(table_name).delete(returning=ReturnMethod.minimal)\
+        .not_.in_('id', keep_ids).execute()
+
 
-        # Insert blog posts
-        if BLOG_POSTS:
-            response = supabase.table('blog_posts').insert(BLOG_POSTS).execute()
-            print(f"Inserted {len(BLOG_POSTS)} blog posts")
+async def _chunked_upsert(table_name, rows, semaphore, chunk=SEED_BATCH_SIZE):
+    async def upsert_rows(batch):
+        async with semaphore:
+            await asyncio.to_thread(_upsert_rows, table_name, batch)
 
-        print("Database seeding completed!")
+    async def upsert(batch):
+        try:
+            await upsert_rows(batch)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                raise
+            print(f"Batch of {len(batch)} {table_name} rows failed ({e}), retrying row by row")
 
+        # Only a failed batch is retried per row, to name the offending rows;
+        # the retries share the same concurrency limit
+        results = await asyncio.gather(*(upsert_rows([row]) for row in batch), return_exceptions=True)
+        failed = []
+        for row, result in zip(batch, results):
+            if isinstance(result, Exception):
+                print(f"Error seeding {table_name} row {row['id']}: {result}")
+                failed.append(row['id'])
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(batch)} rows failed: {', '.join(failed)}")
+
+    await asyncio.gather(*(upsert(rows[start:start + chunk]) for start in range(0, len(rows), chunk)))
+
+
+async def _seed_table(table_name, rows, label, semaphore):
+    try:
+        await _chunked_upsert(table_name, rows, semaphore)
+        # Rows dropped from the catalog since the last seed are the only ones deleted
+        await asyncio.to_thread(_prune_rows, table_name, [row['id'] for row in rows])
+        print(f"Seeded {len(rows)} {label}")
     except Exception as e:
-        print(f"Error seeding database: {e}")
+        print(f"Error seeding {table_name}: {e}")
         print("Make sure your Supabase tables are created with the correct schema.")
 
 
+async def _seed_tables():
+    # Tables are independent, so their writes overlap; a failure in one doesn't abort the other
+    semaphore = asyncio.Semaphore(SEED_CONCURRENCY)
+    await asyncio.gather(*(
+        _seed_table(table_name, rows, label, semaphore)
+        for table_name, rows, label in (('services', SERVICES, 'services'),
+                                        ('blog_posts', BLOG_POSTS, 'blog posts'))
+        if rows
+    ))
+
+
+def seed_database():
+    print("Starting database seeding...")
+
+    # One round-trip, one transaction where the schema has seed_catalog()
+    try:
+        get_supabase().rpc('seed_catalog', {
+            'services_data': SERVICES, 'blog_posts_data': BLOG_POSTS
+        }).execute()
+        print(f"Seeded {len(SERVICES)} services and {len(BLOG_POSTS)} blog posts")
+    except Exception as e:
+        print(f"seed_catalog unavailable ({e}), seeding tables individually")
+        # Upserts make re-seeding idempotent, so existing rows are not cleared first
+        asyncio.run(_seed_tables())
+    print("Database seeding completed!")
+
+
 if __name__ == "__main__":
     seed_database()
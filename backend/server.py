@@ -1,24 +1,37 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Depends, UploadFile, File, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from contextlib import asynccontextmanager
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from postgrest.types import ReturnMethod
 import os
+import time
+import hashlib
+import asyncio
 import logging
+import orjson
+import httpx
+import importlib.util
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone
+from collections import defaultdict, deque
+from types import MappingProxyType
+from timestamps import utc_now_iso
 try:
+    import hipaa_compliance
     from hipaa_compliance import (
         HIPAAAuditLogger, HIPAAValidator, HIPAASecurityHeaders,
-        HIPAADataRetention, encryption, AuditEventType
+        HIPAADataRetention, AuditEventType
     )
     HIPAA_AVAILABLE = True
 except ImportError as e:
@@ -26,7 +39,13 @@ except ImportError as e:
     HIPAA_AVAILABLE = False
 
 try:
-    from file_handler import HIPAAFileHandler, FileUploadResponse
+    from brotli_asgi import BrotliMiddleware
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    from file_handler import HIPAAFileHandler, FileUploadResponse, file_list_cursor
     FILE_HANDLER_AVAILABLE = True
 except ImportError as e:
     print(f"File handler not available: {e}")
@@ -57,8 +76,49 @@ if not supabase_url or not supabase_key:
 if 'demo-project' in supabase_url or 'placeholder' in supabase_url:
     raise ValueError("Production requires a real Supabase project URL, not a placeholder")
 
+# One pooled keep-alive HTTP client shared by every PostgREST call, so requests
+# (including those run in worker threads) reuse TLS connections. With h2
+# installed, concurrent requests multiplex over HTTP/2 instead of queueing.
+# SUPABASE_MAX_CONNECTIONS is the budget for the whole deployment, split
+# evenly across its WEB_CONCURRENCY worker processes
+SUPABASE_MAX_CONNECTIONS = max(
+    2,
+    int(os.environ.get('SUPABASE_MAX_CONNECTIONS', '20')) // int(os.environ.get('WEB_CONCURRENCY', '1'))
+)
+SUPABASE_TIMEOUT = float(os.environ.get('SUPABASE_TIMEOUT', '10'))
+
+
+class OrjsonHTTPClient(httpx.Client):
+    """httpx client that encodes JSON request bodies (inserts, updates) with orjson"""
+
+    def build_request(self, method, url, *, json=None, headers=None, **kwargs):
+        if json is None:
+            return super().build_request(method, url, headers=headers, **kwargs)
+        headers = httpx.Headers(headers)
+        headers.setdefault('Content-Type', 'application/json')
+        kwargs['content'] = orjson.dumps(json)
+        return super().build_request(method, url, headers=headers, **kwargs)
+
+
+supabase_http_client = OrjsonHTTPClient(
+    limits=httpx.Limits(
+        max_connections=SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=SUPABASE_MAX_CONNECTIONS // 2,
+        keepalive_expiry=30
+    ),
+    timeout=SUPABASE_TIMEOUT,
+    http2=importlib.util.find_spec('h2') is not None
+)
+
 try:
-    supabase: Client = create_client(supabase_url, supabase_key)
+    supabase: Client = create_client(
+        supabase_url,
+        supabase_key,
+        options=ClientOptions(
+            postgrest_client_timeout=SUPABASE_TIMEOUT,
+            httpx_client=supabase_http_client
+        )
+    )
     SUPABASE_AVAILABLE = True
     print("✅ Connected to Supabase instance")
 except Exception as e:
@@ -86,17 +146,81 @@ else:
 # Security
 security = HTTPBearer(auto_error=False)
 
+# Interactive docs and the OpenAPI schema are only served outside production
+docs_enabled = os.environ.get('ENVIRONMENT') != 'production'
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fill the UUID pool and open Supabase connections before taking traffic
+    # Created here rather than at import so it binds to the serving loop (Python 3.9)
+    app.state.uuid_pool_low = asyncio.Event()
+    _refill_uuid_pool()
+    uuid_pool_task = asyncio.create_task(_uuid_pool_refiller(app.state.uuid_pool_low))
+    try:
+        # Warms the httpx pool (TLS, HTTP/2) and the catalog cache in one go
+        await asyncio.gather(*(get_catalog_rows(table_name) for table_name in CATALOG_COLUMNS))
+    except Exception as e:
+        logger.warning(f"Catalog warm-up failed: {e}")
+
+    yield
+
+    uuid_pool_task.cancel()
+    if audit_logger:
+        await audit_logger.db_writer.flush()
+        audit_logger.log_buffer.flush()
+    if file_handler:
+        await file_handler.flush_logs()
+    supabase_http_client.close()
+
+
 # Create the main app without a prefix
 app = FastAPI(
+    lifespan=lifespan,
     title="Dr. Kishan Bhalani - Medical Documentation API",
     description="HIPAA-compliant API for veteran medical documentation services",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    docs_url="/docs" if docs_enabled else None,
+    redoc_url="/redoc" if docs_enabled else None,
+    openapi_url="/openapi.json" if docs_enabled else None
 )
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 
+# ===== ID POOL =====
+# Record ids are drawn from a pool filled with one bulk os.urandom read, which
+# a background task tops up once it drops below half full
+UUID_POOL_SIZE = 4096
+_uuid_pool = deque()
+
+
+def _refill_uuid_pool():
+    raw = os.urandom(16 * (UUID_POOL_SIZE - len(_uuid_pool)))
+    _uuid_pool.extend(
+        str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, len(raw), 16)
+    )
+
+
+def next_uuid() -> str:
+    """Return a random UUID4 string from the preallocated pool"""
+    pool_low = getattr(app.state, 'uuid_pool_low', None)
+    if pool_low is not None and len(_uuid_pool) < UUID_POOL_SIZE // 2:
+        pool_low.set()
+    try:
+        return _uuid_pool.popleft()
+    except IndexError:
+        return str(uuid.uuid4())
+
+
+async def _uuid_pool_refiller(pool_low: asyncio.Event):
+    while True:
+        await pool_low.wait()
+        pool_low.clear()
+        _refill_uuid_pool()
+
+
 # ===== HIPAA MIDDLEWARE =====
 class RailwayHostFixMiddleware(BaseHTTPMiddleware):
     """Middleware to handle Railway host header issues"""
@@ -128,7 +252,7 @@ class HIPAASecurityMiddleware(BaseHTTPMiddleware):
             try:
                 from hipaa_compliance import AuditLog
                 audit_log = AuditLog(
-                    timestamp=datetime.now(timezone.utc).isoformat(),
+                    timestamp=utc_now_iso(),
                     event_type=AuditEventType.SYSTEM_ACCESS,
                     ip_address=client_ip,
                     user_agent=user_agent,
@@ -144,15 +268,22 @@ class HIPAASecurityMiddleware(BaseHTTPMiddleware):
         # Process request
         response = await call_next(request)
 
-        # Add HIPAA security headers
+        # Add HIPAA security headers; public catalog routes set their own
+        # Cache-Control, which takes precedence over the no-store defaults
+        cacheable = 'cache-control' in response.headers
         for header, value in security_headers.get_security_headers().items():
+            if cacheable and header in ('Cache-Control', 'Pragma', 'Expires'):
+                continue
             response.headers[header] = value
 
         return response
 
 
 class HIPAARateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware for HIPAA compliance"""
+    """Rate limiting middleware for HIPAA compliance.
+
+    Counts are kept in process memory, so the limit applies per worker.
+    """
 
     def __init__(self, app, calls_per_minute: int = 60):
         super().__init__(app)
@@ -161,10 +292,10 @@ class HIPAARateLimitMiddleware(BaseHTTPMiddleware):
 
     async def dispatch(self, request: Request, call_next):
         client_ip = request.client.host
-        current_time = datetime.now()
+        current_time = time.time()
 
         # Clean old requests
-        cutoff_time = current_time.timestamp() - 60
+        cutoff_time = current_time - 60
         self.requests = {
             ip: [req_time for req_time in times if req_time > cutoff_time]
             for ip, times in self.requests.items()
@@ -180,7 +311,7 @@ class HIPAARateLimitMiddleware(BaseHTTPMiddleware):
                 try:
                     from hipaa_compliance import AuditLog
                     audit_log = AuditLog(
-                        timestamp=current_time.isoformat(),
+                        timestamp=utc_now_iso(),
                         event_type=AuditEventType.UNAUTHORIZED_ACCESS,
                         ip_address=client_ip,
                         action='Rate limit exceeded',
@@ -192,7 +323,7 @@ class HIPAARateLimitMiddleware(BaseHTTPMiddleware):
                     pass
             raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
-        self.requests[client_ip].append(current_time.timestamp())
+        self.requests[client_ip].append(current_time)
         return await call_next(request)
 
 
@@ -217,8 +348,13 @@ def require_phi_access(user_role: str = "patient"):
 
 
 # ===== MODELS =====
+# Shared by the API models: unknown columns are dropped and pydantic skips
+# assignment validation and whitespace stripping
+API_MODEL_CONFIG = ConfigDict(extra="ignore", validate_assignment=False, str_strip_whitespace=False)
+
+
 class Service(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = API_MODEL_CONFIG
     id: str
     slug: str
     title: str
@@ -233,7 +369,7 @@ class Service(BaseModel):
 
 
 class BlogPost(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = API_MODEL_CONFIG
     id: str
     slug: str
     title: str
@@ -246,16 +382,22 @@ class BlogPost(BaseModel):
     readTime: str
 
 
+# Basic address shape check compiled once by pydantic-core, instead of
+# importing email-validator for EmailStr
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
 class ContactCreate(BaseModel):
+    model_config = API_MODEL_CONFIG
     name: str
-    email: EmailStr
+    email: str = Field(pattern=EMAIL_PATTERN)
     phone: Optional[str] = None
     subject: str
     message: str
 
 
 class Contact(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = API_MODEL_CONFIG
     id: str
     name: str
     email: str
@@ -266,6 +408,159 @@ class Contact(BaseModel):
     createdAt: str
 
 
+# ===== CATALOG CACHE =====
+# Services and blog posts are seeded catalog data, so their rows are kept per
+# process and refreshed after CATALOG_CACHE_TTL seconds. Views derived from the
+# rows (serialized JSON, slug index, search index) are rebuilt when the rows change.
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', 300))
+_catalog_rows = {}
+_catalog_locks = defaultdict(asyncio.Lock)
+_catalog_cache = {}
+
+
+def _serialize_catalog(data):
+    body = orjson.dumps(data, default=dict)
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def catalog_response(request: Request, entry):
+    """Build a publicly cacheable response, answering 304 for a matching ETag"""
+    body, etag = entry
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={int(CATALOG_CACHE_TTL)}"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Catalog rows are returned without response validation, so only the columns
+# documented by their models are selected
+CATALOG_COLUMNS = {
+    'services': ','.join(Service.model_fields),
+    'blog_posts': ','.join(BlogPost.model_fields),
+}
+
+
+def fetch_catalog_rows(table_name):
+    """Select catalog rows as read-only mappings shared by the derived views"""
+    return tuple(
+        MappingProxyType(row)
+        for row in supabase.table(table_name).select(CATALOG_COLUMNS[table_name]).execute().data
+    )
+
+
+async def get_catalog_rows(table_name):
+    """Return cached catalog rows, refreshing them off the event loop on expiry"""
+    cached = _catalog_rows.get(table_name)
+    if cached and time.monotonic() - cached[0] < CATALOG_CACHE_TTL:
+        return cached[1]
+
+    # One refresh per table; concurrent misses wait for it instead of re-querying
+    async with _catalog_locks[table_name]:
+        cached = _catalog_rows.get(table_name)
+        if cached and time.monotonic() - cached[0] < CATALOG_CACHE_TTL:
+            return cached[1]
+        rows = await asyncio.to_thread(fetch_catalog_rows, table_name)
+        _catalog_rows[table_name] = (time.monotonic(), rows)
+        return rows
+
+
+def _derive(key, rows, build):
+    """Return build(rows), reusing the last result while the rows are unchanged"""
+    cached = _catalog_cache.get(key)
+    if cached and cached[0] is rows:
+        return cached[1]
+
+    value = build(rows)
+    _catalog_cache[key] = (rows, value)
+    return value
+
+
+def get_catalog_body(table_name, rows):
+    """Return (JSON body, ETag) for a whole catalog table"""
+    return _derive((table_name, 'body'), rows, _serialize_catalog)
+
+
+def get_catalog_by_slug(table_name, rows):
+    """Return a slug -> (JSON body, ETag) index for a catalog table"""
+    return _derive(
+        (table_name, 'by_slug'),
+        rows,
+        lambda rows: {row['slug']: _serialize_catalog(row) for row in rows}
+    )
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _build_blog_search_index(posts):
+    rows = [
+        (post, post['title'].lower(), post['excerpt'].lower())
+        for post in posts
+    ]
+    trigrams = defaultdict(set)
+    for position, (_, title_lower, excerpt_lower) in enumerate(rows):
+        for gram in _trigrams(title_lower) | _trigrams(excerpt_lower):
+            trigrams[gram].add(position)
+    return rows, dict(trigrams)
+
+
+def get_blog_search_rows(posts):
+    """Return (post, lowercase title, lowercase excerpt) tuples for blog search"""
+    return _derive(('blog_posts', 'search'), posts, _build_blog_search_index)[0]
+
+
+def find_blog_search_candidates(posts, q):
+    """Return search rows that can contain q, narrowed through the trigram index"""
+    rows, trigrams = _derive(('blog_posts', 'search'), posts, _build_blog_search_index)
+    grams = _trigrams(q.lower())
+    if not grams:
+        return rows
+
+    # Every substring match contains all of the query's trigrams
+    postings = sorted((trigrams.get(gram, set()) for gram in grams), key=len)
+    positions = postings[0].intersection(*postings[1:])
+    return [rows[position] for position in sorted(positions)]
+
+
+def filter_blog_posts(search_rows, category=None, q=None, limit=20):
+    """Filter blog posts in a single pass, stopping once limit matches are found"""
+    q_lower = q.lower() if q else None
+    result = []
+    for post, title_lower, excerpt_lower in search_rows:
+        if len(result) >= limit:
+            break
+        if category and post['category'] != category:
+            continue
+        if q_lower and q_lower not in title_lower and q_lower not in excerpt_lower:
+            continue
+        result.append(post)
+    return result
+
+
+# Health probes tolerate a timestamp that is up to HEALTH_CACHE_TTL seconds old
+HEALTH_CACHE_TTL = 1.0
+# -inf so the first call always builds the body, even right after boot when
+# time.monotonic() may still be below HEALTH_CACHE_TTL
+_health_cache = [float("-inf"), b""]
+
+
+def get_health_body():
+    """Return the serialized health payload, rebuilt at most once per TTL"""
+    now = time.monotonic()
+    if now - _health_cache[0] > HEALTH_CACHE_TTL:
+        _health_cache[0] = now
+        _health_cache[1] = orjson.dumps({
+            "status": "healthy",
+            "timestamp": utc_now_iso(),
+            "hipaa_compliant": True
+        })
+    return _health_cache[1]
+
+
 # ===== ROUTES =====
 @api_router.get("/")
 async def root():
@@ -275,38 +570,34 @@ async def root():
 @api_router.get("/health")
 async def api_health_check():
     """API Health check endpoint"""
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "hipaa_compliant": True
-    }
+    return Response(content=get_health_body(), media_type="application/json")
 
 
 
 
-@api_router.get("/services", response_model=List[Service])
-async def get_services():
+@api_router.get("/services", responses={200: {"model": List[Service]}})
+async def get_services(request: Request):
     if not SUPABASE_AVAILABLE or not supabase:
         raise HTTPException(status_code=503, detail="Database service unavailable")
 
     try:
-        response = supabase.table('services').select('*').execute()
-        return response.data
+        rows = await get_catalog_rows('services')
+        return catalog_response(request, get_catalog_body('services', rows))
     except Exception as e:
         logger.error(f"Error fetching services: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch services")
 
 
-@api_router.get("/services/{slug}", response_model=Service)
-async def get_service_by_slug(slug: str):
+@api_router.get("/services/{slug}", responses={200: {"model": Service}})
+async def get_service_by_slug(slug: str, request: Request):
     if not SUPABASE_AVAILABLE or not supabase:
         raise HTTPException(status_code=503, detail="Database service unavailable")
 
     try:
-        response = supabase.table('services').select('*').eq('slug', slug).execute()
-        if not response.data:
+        entry = get_catalog_by_slug('services', await get_catalog_rows('services')).get(slug)
+        if entry is None:
             raise HTTPException(status_code=404, detail="Service not found")
-        return response.data[0]
+        return catalog_response(request, entry)
     except HTTPException:
         raise
     except Exception as e:
@@ -314,8 +605,9 @@ async def get_service_by_slug(slug: str):
         raise HTTPException(status_code=500, detail="Failed to fetch service")
 
 
-@api_router.get("/blog", response_model=List[BlogPost])
+@api_router.get("/blog", responses={200: {"model": List[BlogPost]}})
 async def get_blog_posts(
+    request: Request,
     category: Optional[str] = Query(None),
     q: Optional[str] = Query(None),
     limit: int = Query(20, le=100)
@@ -324,33 +616,30 @@ async def get_blog_posts(
         raise HTTPException(status_code=503, detail="Database service unavailable")
 
     try:
-        query = supabase.table('blog_posts').select('*')
-
-        if category:
-            query = query.eq('category', category)
-
+        # Only the full catalog is cached; category and limit are applied per
+        # request so client-chosen parameters cannot grow the cache
+        rows = await get_catalog_rows('blog_posts')
         if q:
-            # Supabase uses ilike for case-insensitive search
-            query = query.or_(f'title.ilike.%{q}%,excerpt.ilike.%{q}%')
+            posts = filter_blog_posts(find_blog_search_candidates(rows, q), category, q, limit)
+            return Response(content=orjson.dumps(posts, default=dict), media_type="application/json")
 
-        query = query.limit(limit)
-        response = query.execute()
-        return response.data
+        posts = filter_blog_posts(get_blog_search_rows(rows), category, None, limit)
+        return catalog_response(request, _serialize_catalog(posts))
     except Exception as e:
         logger.error(f"Error fetching blog posts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch blog posts")
 
 
-@api_router.get("/blog/{slug}", response_model=BlogPost)
-async def get_blog_post(slug: str):
+@api_router.get("/blog/{slug}", responses={200: {"model": BlogPost}})
+async def get_blog_post(slug: str, request: Request):
     if not SUPABASE_AVAILABLE or not supabase:
         raise HTTPException(status_code=503, detail="Database service unavailable")
 
     try:
-        response = supabase.table('blog_posts').select('*').eq('slug', slug).execute()
-        if not response.data:
+        entry = get_catalog_by_slug('blog_posts', await get_catalog_rows('blog_posts')).get(slug)
+        if entry is None:
             raise HTTPException(status_code=404, detail="Blog post not found")
-        return response.data[0]
+        return catalog_response(request, entry)
     except HTTPException:
         raise
     except Exception as e:
@@ -366,7 +655,8 @@ async def create_contact(contact_data: ContactCreate, request: Request):
         # Check if data contains PHI
         contains_phi = validator.is_phi_data(contact_dict)
 
-        # Encrypt PHI fields
+        # Encrypt PHI fields; the shared key is derived on first use, not at import
+        encryption = hipaa_compliance.encryption
         if contains_phi:
             if contact_dict.get('name'):
                 contact_dict['name'] = encryption.encrypt_phi(contact_dict['name'])
@@ -376,22 +666,28 @@ async def create_contact(contact_data: ContactCreate, request: Request):
                 contact_dict['phone'] = encryption.encrypt_phi(contact_dict['phone'])
 
         contact_obj = Contact(
-            id=str(uuid.uuid4()),
+            id=next_uuid(),
             **contact_dict,
-            createdAt=datetime.now(timezone.utc).isoformat()
+            createdAt=utc_now_iso()
         )
 
-        # Insert into database
-        response = supabase.table('contacts').insert(contact_obj.model_dump()).execute()
+        # Insert into database (blocking client calls run off the event loop)
+        await asyncio.to_thread(
+            supabase.table('contacts').insert(
+                contact_obj.model_dump(), returning=ReturnMethod.minimal
+            ).execute
+        )
 
         # Schedule for data retention (6 years for medical records)
-        data_retention.schedule_data_deletion('contacts', contact_obj.id, retention_years=6)
+        await asyncio.to_thread(
+            data_retention.schedule_data_deletion, 'contacts', contact_obj.id, retention_years=6
+        )
 
         # Log PHI creation
         if contains_phi:
             from hipaa_compliance import AuditLog
             audit_log = AuditLog(
-                timestamp=datetime.now(timezone.utc).isoformat(),
+                timestamp=utc_now_iso(),
                 event_type=AuditEventType.PHI_CREATE,
                 ip_address=request.client.host,
                 user_agent=request.headers.get("user-agent", ""),
@@ -423,7 +719,7 @@ async def create_contact(contact_data: ContactCreate, request: Request):
         # Log failed PHI creation attempt
         from hipaa_compliance import AuditLog
         audit_log = AuditLog(
-            timestamp=datetime.now(timezone.utc).isoformat(),
+            timestamp=utc_now_iso(),
             event_type=AuditEventType.PHI_CREATE,
             ip_address=request.client.host,
             user_agent=request.headers.get("user-agent", ""),
@@ -445,16 +741,12 @@ async def root_health():
         "message": "Dr. Kishan Bhalani Medical Documentation Services",
         "status": "healthy",
         "version": "1.0.0",
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": utc_now_iso()
     }
 
 @app.get("/health")
 async def root_health_check():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "hipaa_compliant": True
-    }
+    return Response(content=get_health_body(), media_type="application/json")
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -476,6 +768,14 @@ is_railway = railway_env is not None or 'railway.app' in os.environ.get('RAILWAY
 print(f"Railway environment detected: {is_railway}")
 print("COMPLETELY DISABLING TrustedHostMiddleware for Railway compatibility")
 
+# Response compression for JSON payloads (Brotli falls back to gzip itself).
+# Registered first so it wraps the route response directly and can honour
+# minimum_size before the streaming HTTP middlewares below.
+if BROTLI_AVAILABLE:
+    app.add_middleware(BrotliMiddleware, minimum_size=512, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
 # Add Railway host fix middleware first
 app.add_middleware(RailwayHostFixMiddleware)
 
@@ -490,15 +790,25 @@ if not is_railway:
 else:
     print("Railway deployment - skipping host validation completely")
 
-# CORS middleware (more restrictive for HIPAA)
-cors_origins = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+# CORS middleware (more restrictive for HIPAA). Auth uses bearer tokens, so
+# credentials mode is not needed; that also keeps a "*" entry valid, in which
+# case Starlette answers any origin without matching the list.
+cors_origins = [
+    origin.strip()
+    for origin in os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    if origin.strip()
+]
+if '*' in cors_origins:
+    cors_origins = ['*']
+    print("⚠️ CORS_ORIGINS contains '*': any website may call this API; list explicit origins in production")
+print(f"CORS allowed origins: {cors_origins}")
 app.add_middleware(
     CORSMiddleware,
-    allow_credentials=True,
+    allow_credentials=False,
     allow_origins=cors_origins,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["Authorization", "Content-Type"],
-    expose_headers=["X-Request-ID"]
+    expose_headers=["X-Request-ID", "X-Next-Cursor"]
 )
 
 # Configure logging
@@ -533,7 +843,7 @@ async def get_audit_logs(
             query = query.lte('timestamp', end_date)
 
         query = query.order('timestamp', desc=True).limit(limit)
-        response = query.execute()
+        response = await asyncio.to_thread(query.execute)
 
         return {
             "audit_logs": response.data,
@@ -554,11 +864,11 @@ async def get_compliance_summary(current_user = Depends(get_current_user)):
         #     raise HTTPException(status_code=403, detail="Admin access required")
 
         # Get compliance summary from view
-        response = supabase.rpc('get_hipaa_compliance_summary').execute()
+        response = await asyncio.to_thread(supabase.rpc('get_hipaa_compliance_summary').execute)
 
         return {
             "compliance_summary": response.data,
-            "generated_at": datetime.now(timezone.utc).isoformat()
+            "generated_at": utc_now_iso()
         }
 
     except Exception as e:
@@ -574,11 +884,11 @@ async def execute_data_retention(current_user = Depends(get_current_user)):
         # if not current_user or current_user.role != 'admin':
         #     raise HTTPException(status_code=403, detail="Admin access required")
 
-        data_retention.execute_scheduled_deletions()
+        await asyncio.to_thread(data_retention.execute_scheduled_deletions)
 
         from hipaa_compliance import AuditLog
         audit_log = AuditLog(
-            timestamp=datetime.now(timezone.utc).isoformat(),
+            timestamp=utc_now_iso(),
             event_type=AuditEventType.PHI_DELETE,
             user_email='system',
             action='Executed scheduled data retention deletions',
@@ -607,9 +917,9 @@ async def report_breach_incident(
         #     raise HTTPException(status_code=403, detail="Admin access required")
 
         breach_record = {
-            'id': str(uuid.uuid4()),
+            'id': next_uuid(),
             'incident_date': incident_data.get('incident_date'),
-            'discovered_date': datetime.now(timezone.utc).isoformat(),
+            'discovered_date': utc_now_iso(),
             'incident_type': incident_data.get('incident_type'),
             'description': incident_data.get('description'),
             'affected_individuals_count': incident_data.get('affected_individuals_count', 0),
@@ -619,12 +929,14 @@ async def report_breach_incident(
             'status': 'investigating'
         }
 
-        response = supabase.table('hipaa_breach_incidents').insert(breach_record).execute()
+        await asyncio.to_thread(supabase.table('hipaa_breach_incidents').insert(
+            breach_record, returning=ReturnMethod.minimal
+        ).execute)
 
         # Log the breach report
         from hipaa_compliance import AuditLog
         audit_log = AuditLog(
-            timestamp=datetime.now(timezone.utc).isoformat(),
+            timestamp=utc_now_iso(),
             event_type=AuditEventType.DATA_BREACH_ATTEMPT,
             ip_address=request.client.host,
             user_agent=request.headers.get("user-agent", ""),
@@ -696,16 +1008,22 @@ if FILE_HANDLER_AVAILABLE and file_handler:
 
     @api_router.get("/files")
     async def list_files(
+        response: Response,
         contact_id: Optional[str] = Query(None),
         file_category: Optional[str] = Query(None),
-        limit: int = Query(50, le=100)
+        limit: int = Query(50, le=100),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page")
     ):
         """List uploaded files"""
-        return await file_handler.list_files(
+        files = await file_handler.list_files(
             contact_id=contact_id,
             file_category=file_category,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
+        if len(files) == limit:
+            response.headers["X-Next-Cursor"] = file_list_cursor(files[-1])
+        return files
 else:
     @api_router.get("/files/{file_id}")
     async def get_file_info_disabled(file_id: str):
@@ -44,7 +44,7 @@ def create_demo_supabase_config():
 
 SUPABASE_URL=https://demo-project.supabase.co
 SUPABASE_KEY=eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.demo-key-for-testing
-CORS_ORIGINS=http://localhost:3000,*
+CORS_ORIGINS=http://localhost:3000
 HIPAA_ENCRYPTION_KEY=demo-encryption-key-change-in-production
 ENVIRONMENT=development
 ALLOWED_HOSTS=localhost,yourdomain.com
@@ -77,26 +77,42 @@ Mock Supabase Client for Testing
 This provides a fake Supabase interface for development without a real database
 """
 
+from types import MappingProxyType
+
 class MockSupabaseResponse:
     def __init__(self, data):
         self.data = data
 
 class MockSupabaseTable:
-    def __init__(self, table_name, mock_data):
+    def __init__(self, table_name, mock_data, indexes=None):
         self.table_name = table_name
         self.mock_data = mock_data
+        self.indexes = indexes or {}
+        self.filters = []
 
     def select(self, columns='*'):
         return self
 
     def eq(self, column, value):
-        if self.table_name == 'services':
-            filtered = [item for item in self.mock_data if item.get(column) == value]
-            return MockSupabaseResponse(filtered)
-        return MockSupabaseResponse([])
+        self.filters.append((column, value))
+        return self
 
     def execute(self):
-        return MockSupabaseResponse(self.mock_data)
+        # Unfiltered reads share the fixture list instead of cloning it
+        filters = self.filters
+        if not filters:
+            return MockSupabaseResponse(self.mock_data)
+
+        # A single eq on an indexed column (id, slug) is a dict lookup
+        if len(filters) == 1 and filters[0][0] in self.indexes:
+            column, value = filters[0]
+            row = self.indexes[column].get(value)
+            return MockSupabaseResponse([row] if row is not None else [])
+
+        # Otherwise all filters are applied in a single pass over the rows
+        data = [item for item in self.mock_data
+                if all(item.get(column) == value for column, value in filters)]
+        return MockSupabaseResponse(data)
 
     def insert(self, data):
         return MockSupabaseResponse([data] if isinstance(data, dict) else data)
@@ -107,46 +123,65 @@ class MockSupabaseTable:
     def delete(self):
         return MockSupabaseResponse([])
 
+def _frozen(value):
+    """Read-only copy of a fixture value, so no caller can change what other clients see"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _frozen(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(item) for item in value)
+    return value
+
+# Static fixture rows, shared by every client instead of rebuilt per instance;
+# they are read-only (the server serializes mapping proxies via orjson default=dict)
+SERVICES_DATA = _frozen((
+    {
+        "id": "1",
+        "slug": "nexus-rebuttal-letters",
+        "title": "Nexus & Rebuttal Letters",
+        "shortDescription": "Comprehensive medical opinions for claims and appeals",
+        "fullDescription": "Professional nexus and rebuttal letters that establish clear connections between your military service and medical conditions.",
+        "features": ["Nexus opinion letters", "Rebuttal to VA denials", "Up to 4 claims per letter", "Clear medical rationale", "Rush service: +$500 USD (36-48 hours)"],
+        "basePriceInUSD": 1499,
+        "duration": "7-10 business days",
+        "category": "nexus-letter",
+        "icon": "file-text",
+        "faqs": [{"question": "What is a nexus letter?", "answer": "A nexus letter establishes the connection between military service and a medical condition."}]
+    },
+    # Add more services as needed
+))
+
+BLOG_DATA = _frozen((
+    {
+        "id": "1",
+        "slug": "nexus-and-rebuttal-letters-explained",
+        "title": "Nexus and Rebuttal Letters: Your Key to VA Claim Success",
+        "excerpt": "Understanding the difference between nexus and rebuttal letters.",
+        "contentHTML": "<h2>Understanding Nexus and Rebuttal Letters</h2><p>Both are crucial medical documents.</p>",
+        "category": "nexus-letters",
+        "tags": ["nexus", "rebuttal"],
+        "authorName": "Dr. Kishan Bhalani",
+        "publishedAt": "SEPT 2025",
+        "readTime": "6 min read"
+    },
+))
+
+# Unique-column indexes for O(1) eq('id' | 'slug', ...) lookups
+INDEXES = {
+    table_name: {column: {row[column]: row for row in rows} for column in ('id', 'slug')}
+    for table_name, rows in (('services', SERVICES_DATA), ('blog_posts', BLOG_DATA))
+}
+
 class MockSupabaseClient:
     def __init__(self):
-        # Mock services data
-        self.services_data = [
-            {
-                "id": "1",
-                "slug": "nexus-rebuttal-letters",
-                "title": "Nexus & Rebuttal Letters",
-                "shortDescription": "Comprehensive medical opinions for claims and appeals",
-                "fullDescription": "Professional nexus and rebuttal letters that establish clear connections between your military service and medical conditions.",
-                "features": ["Nexus opinion letters", "Rebuttal to VA denials", "Up to 4 claims per letter", "Clear medical rationale", "Rush service: +$500 USD (36-48 hours)"],
-                "basePriceInUSD": 1499,
-                "duration": "7-10 business days",
-                "category": "nexus-letter",
-                "icon": "file-text",
-                "faqs": [{"question": "What is a nexus letter?", "answer": "A nexus letter establishes the connection between military service and a medical condition."}]
-            }
-            # Add more services as needed
-        ]
-
-        self.blog_data = [
-            {
-                "id": "1",
-                "slug": "nexus-and-rebuttal-letters-explained",
-                "title": "Nexus and Rebuttal Letters: Your Key to VA Claim Success",
-                "excerpt": "Understanding the difference between nexus and rebuttal letters.",
-                "contentHTML": "<h2>Understanding Nexus and Rebuttal Letters</h2><p>Both are crucial medical documents.</p>",
-                "category": "nexus-letters",
-                "tags": ["nexus", "rebuttal"],
-                "authorName": "Dr. Kishan Bhalani",
-                "publishedAt": "SEPT 2025",
-                "readTime": "6 min read"
-            }
-        ]
+        self.services_data = SERVICES_DATA
+        self.blog_data = BLOG_DATA
+        self.indexes = INDEXES
 
     def table(self, table_name):
         if table_name == 'services':
-            return MockSupabaseTable(table_name, self.services_data)
+            return MockSupabaseTable(table_name, self.services_data, self.indexes['services'])
         elif table_name == 'blog_posts':
-            return MockSupabaseTable(table_name, self.blog_data)
+            return MockSupabaseTable(table_name, self.blog_data, self.indexes['blog_posts'])
         elif table_name == 'contacts':
             return MockSupabaseTable(table_name, [])
         else:
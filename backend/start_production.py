@@ -16,7 +16,7 @@ def setup_environment():
     """Setup production environment"""
     # Set default environment variables if not present
     os.environ.setdefault('ENVIRONMENT', 'production')
-    os.environ.setdefault('CORS_ORIGINS', '*')
+    os.environ.setdefault('CORS_ORIGINS', 'https://base-skel.netlify.app')
     os.environ.setdefault('ALLOWED_HOSTS', '*')
 
     # Validate required environment variables
@@ -6,10 +6,10 @@ CREATE TABLE IF NOT EXISTS services (
     id TEXT PRIMARY KEY,
     slug TEXT UNIQUE NOT NULL,
     title TEXT NOT NULL,
-    shortDescription TEXT NOT NULL,
-    fullDescription TEXT NOT NULL,
+    "shortDescription" TEXT NOT NULL,
+    "fullDescription" TEXT NOT NULL,
     features JSONB NOT NULL DEFAULT '[]',
-    basePriceInUSD INTEGER NOT NULL,
+    "basePriceInUSD" INTEGER NOT NULL,
     duration TEXT NOT NULL,
     category TEXT NOT NULL,
     icon TEXT NOT NULL,
@@ -24,12 +24,12 @@ CREATE TABLE IF NOT EXISTS blog_posts (
     slug TEXT UNIQUE NOT NULL,
     title TEXT NOT NULL,
     excerpt TEXT NOT NULL,
-    contentHTML TEXT NOT NULL,
+    "contentHTML" TEXT NOT NULL,
     category TEXT NOT NULL,
     tags JSONB NOT NULL DEFAULT '[]',
-    authorName TEXT NOT NULL,
-    publishedAt TEXT NOT NULL,
-    readTime TEXT NOT NULL,
+    "authorName" TEXT NOT NULL,
+    "publishedAt" TEXT NOT NULL,
+    "readTime" TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -43,7 +43,7 @@ CREATE TABLE IF NOT EXISTS contacts (
     subject TEXT NOT NULL,
     message TEXT NOT NULL,
     status TEXT NOT NULL DEFAULT 'new',
-    createdAt TEXT NOT NULL,
+    "createdAt" TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -72,6 +72,64 @@ CREATE POLICY "Allow public read access to blog posts" ON blog_posts
 CREATE POLICY "Allow public insert access to contacts" ON contacts
     FOR INSERT WITH CHECK (true);
 
+-- Re-seeds the catalog in one transaction (seed_data.py): upserts the given
+-- rows and removes any no longer listed. Only the service role may call it.
+CREATE OR REPLACE FUNCTION seed_catalog(services_data JSONB, blog_posts_data JSONB)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO services (id, slug, title, "shortDescription", "fullDescription", features,
+                          "basePriceInUSD", duration, category, icon, faqs)
+    SELECT id, slug, title, "shortDescription", "fullDescription", features,
+           "basePriceInUSD", duration, category, icon, faqs
+    FROM jsonb_to_recordset(services_data) AS s(
+        id TEXT, slug TEXT, title TEXT, "shortDescription" TEXT, "fullDescription" TEXT,
+        features JSONB, "basePriceInUSD" INTEGER, duration TEXT, category TEXT,
+        icon TEXT, faqs JSONB
+    )
+    ON CONFLICT (id) DO UPDATE SET
+        slug = EXCLUDED.slug,
+        title = EXCLUDED.title,
+        "shortDescription" = EXCLUDED."shortDescription",
+        "fullDescription" = EXCLUDED."fullDescription",
+        features = EXCLUDED.features,
+        "basePriceInUSD" = EXCLUDED."basePriceInUSD",
+        duration = EXCLUDED.duration,
+        category = EXCLUDED.category,
+        icon = EXCLUDED.icon,
+        faqs = EXCLUDED.faqs,
+        updated_at = NOW();
+
+    DELETE FROM services
+    WHERE id NOT IN (SELECT elem->>'id' FROM jsonb_array_elements(services_data) AS elem);
+
+    INSERT INTO blog_posts (id, slug, title, excerpt, "contentHTML", category, tags,
+                            "authorName", "publishedAt", "readTime")
+    SELECT id, slug, title, excerpt, "contentHTML", category, tags,
+           "authorName", "publishedAt", "readTime"
+    FROM jsonb_to_recordset(blog_posts_data) AS b(
+        id TEXT, slug TEXT, title TEXT, excerpt TEXT, "contentHTML" TEXT, category TEXT,
+        tags JSONB, "authorName" TEXT, "publishedAt" TEXT, "readTime" TEXT
+    )
+    ON CONFLICT (id) DO UPDATE SET
+        slug = EXCLUDED.slug,
+        title = EXCLUDED.title,
+        excerpt = EXCLUDED.excerpt,
+        "contentHTML" = EXCLUDED."contentHTML",
+        category = EXCLUDED.category,
+        tags = EXCLUDED.tags,
+        "authorName" = EXCLUDED."authorName",
+        "publishedAt" = EXCLUDED."publishedAt",
+        "readTime" = EXCLUDED."readTime",
+        updated_at = NOW();
+
+    DELETE FROM blog_posts
+    WHERE id NOT IN (SELECT elem->>'id' FROM jsonb_array_elements(blog_posts_data) AS elem);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp;
+
+REVOKE ALL ON FUNCTION seed_catalog(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
+
 -- Optional: Create policies for authenticated users to manage data
 -- Uncomment these if you want to add admin functionality later
 -- CREATE POLICY "Allow authenticated users to manage services" ON services
@@ -0,0 +1,192 @@
+"""
+Catalog Tests
+
+Test suite for the cached service and blog catalog and its seeding
+"""
+
+import asyncio
+import time
+from types import MappingProxyType
+
+import pytest
+from starlette.requests import Request
+
+import seed_data
+import server
+
+
+SERVICES = [
+    {"id": "1", "slug": "nexus-letters", "title": "Nexus Letters"},
+    {"id": "2", "slug": "dbqs", "title": "DBQs"},
+]
+BLOG_POSTS = [
+    {"id": str(i), "slug": f"post-{i}", "title": f"Post {i}" + (" Nexus" if i % 2 else ""),
+     "excerpt": "VA claims", "category": "guides" if i < 3 else "news"}
+    for i in range(6)
+]
+
+
+def request_with_headers(**headers):
+    return Request({
+        "type": "http",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+class TestCatalogCache:
+    """Test catalog row caching and the views derived from it"""
+
+    def setup_method(self):
+        self.fetches = []
+        self.tables = {"services": SERVICES, "blog_posts": BLOG_POSTS}
+        self.saved_fetch = server.fetch_catalog_rows
+        server.fetch_catalog_rows = self.fetch
+        server._catalog_rows.clear()
+        server._catalog_cache.clear()
+
+    def teardown_method(self):
+        server.fetch_catalog_rows = self.saved_fetch
+        server._catalog_rows.clear()
+        server._catalog_cache.clear()
+
+    def fetch(self, table_name):
+        self.fetches.append(table_name)
+        time.sleep(0.05)  # a slow query, so concurrent misses overlap
+        return tuple(MappingProxyType(row) for row in self.tables[table_name])
+
+    def test_concurrent_misses_share_one_fetch(self):
+        """Test concurrent requests on a cold cache issue a single query"""
+        async def load():
+            return await asyncio.gather(*(server.get_catalog_rows("services") for _ in range(10)))
+
+        results = asyncio.run(load())
+        assert self.fetches == ["services"]
+        assert all(rows is results[0] for rows in results)
+
+    def test_rows_refetched_after_ttl(self, monkeypatch):
+        """Test expired rows are fetched again"""
+        asyncio.run(server.get_catalog_rows("services"))
+        asyncio.run(server.get_catalog_rows("services"))
+        assert self.fetches == ["services"]
+
+        monkeypatch.setattr(server, "CATALOG_CACHE_TTL", 0)
+        asyncio.run(server.get_catalog_rows("services"))
+        assert self.fetches == ["services", "services"]
+
+    def test_derived_views_follow_rows(self):
+        """Test derived views are reused for the same rows and rebuilt for new ones"""
+        rows = asyncio.run(server.get_catalog_rows("services"))
+        body = server.get_catalog_body("services", rows)
+        assert server.get_catalog_body("services", rows) is body
+        assert set(server.get_catalog_by_slug("services", rows)) == {"nexus-letters", "dbqs"}
+
+        self.tables["services"] = SERVICES[:1]
+        server._catalog_rows.clear()
+        new_rows = asyncio.run(server.get_catalog_rows("services"))
+        assert server.get_catalog_body("services", new_rows) != body
+        assert set(server.get_catalog_by_slug("services", new_rows)) == {"nexus-letters"}
+
+    def test_catalog_response_etag(self):
+        """Test catalog responses carry an ETag and answer a match with 304"""
+        entry = server.get_catalog_body("services", asyncio.run(server.get_catalog_rows("services")))
+        body, etag = entry
+
+        response = server.catalog_response(request_with_headers(), entry)
+        assert response.status_code == 200
+        assert response.body == body
+        assert response.headers["etag"] == etag
+        assert "public" in response.headers["cache-control"]
+
+        not_modified = server.catalog_response(request_with_headers(if_none_match=etag), entry)
+        assert not_modified.status_code == 304
+        assert not_modified.body == b""
+
+    def test_blog_filters(self):
+        """Test blog category, limit and search filtering over the cached rows"""
+        posts = asyncio.run(server.get_catalog_rows("blog_posts"))
+
+        def slugs(found):
+            return [post["slug"] for post in found]
+
+        assert slugs(server.filter_blog_posts(server.get_blog_search_rows(posts), "guides")) == \
+            ["post-0", "post-1", "post-2"]
+        assert slugs(server.filter_blog_posts(server.get_blog_search_rows(posts), "news", limit=2)) == \
+            ["post-3", "post-4"]
+        candidates = server.find_blog_search_candidates(posts, "NEXUS")
+        assert slugs(server.filter_blog_posts(candidates, q="NEXUS")) == ["post-1", "post-3", "post-5"]
+
+
+class FakeSeedQuery:
+    """Just enough of the postgrest builder for seed_data's writes"""
+
+    def __init__(self, client, table_name):
+        self.client = client
+        self.table_name = table_name
+        self.not_ = self
+
+    def upsert(self, rows, **kwargs):
+        self.write = ("upsert", [row["id"] for row in rows])
+        return self
+
+    def delete(self, **kwargs):
+        return self
+
+    def in_(self, column, values):
+        self.write = ("prune", sorted(values))
+        return self
+
+    def execute(self):
+        operation, ids = self.write
+        if operation == "upsert" and self.client.bad_id in ids:
+            raise ValueError(f"invalid row {self.client.bad_id}")
+        self.client.writes.append((self.table_name, operation, ids))
+
+
+class FakeSeedClient:
+    """Supabase client whose schema has no seed_catalog() function"""
+
+    def __init__(self, bad_id=None):
+        self.bad_id = bad_id
+        self.writes = []
+
+    def rpc(self, name, params):
+        raise RuntimeError(f"function {name} does not exist")
+
+    def table(self, table_name):
+        return FakeSeedQuery(self, table_name)
+
+
+class TestSeedFallback:
+    """Test seeding tables individually when seed_catalog() is unavailable"""
+
+    def test_fallback_upserts_and_prunes_each_table(self, monkeypatch):
+        """Test every catalog row is upserted and stale rows pruned per table"""
+        client = FakeSeedClient()
+        monkeypatch.setattr(seed_data, "get_supabase", lambda: client)
+
+        seed_data.seed_database()
+
+        for table_name, rows in (("services", seed_data.SERVICES), ("blog_posts", seed_data.BLOG_POSTS)):
+            ids = sorted(row["id"] for row in rows)
+            upserted = [id_ for name, operation, batch in client.writes
+                        if name == table_name and operation == "upsert" for id_ in batch]
+            assert sorted(upserted) == ids
+            assert (table_name, "prune", ids) in client.writes
+
+    def test_failed_batch_retried_row_by_row(self, monkeypatch):
+        """Test a bad row leaves the rest of its batch seeded and the table unpruned"""
+        client = FakeSeedClient(bad_id=seed_data.SERVICES[0]["id"])
+        monkeypatch.setattr(seed_data, "get_supabase", lambda: client)
+
+        seed_data.seed_database()
+
+        upserted = {id_ for name, operation, batch in client.writes
+                    if name == "services" and operation == "upsert" for id_ in batch}
+        assert upserted == {row["id"] for row in seed_data.SERVICES[1:]}
+        assert not any(name == "services" and operation == "prune"
+                       for name, operation, _ in client.writes)
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -4,12 +4,21 @@ HIPAA Compliance Tests
 Test suite to verify HIPAA compliance implementation
 """
 
+import asyncio
+import io
+import json
+import time
 import pytest
+from postgrest.exceptions import APIError
+from starlette.datastructures import UploadFile
+from dataclasses import asdict
 from datetime import datetime, timezone
+import hipaa_compliance
 from hipaa_compliance import (
     HIPAAEncryption, HIPAAValidator, HIPAASecurityHeaders,
-    AuditEventType, AuditLog
+    AuditEventType, AuditLog, BatchWriter
 )
+from file_handler import HIPAAFileHandler, PHI_FRAME_HEADER, UPLOAD_CHUNK_SIZE
 
 
 class TestHIPAAEncryption:
@@ -40,13 +49,37 @@ class TestHIPAAEncryption:
 
         assert hash1 == hash2  # Consistent hashing
         assert hash1 != data   # Hash is different from original
-        assert len(hash1) == 64  # SHA-256 produces 64-char hex string
+        assert len(hash1) == 64  # BLAKE2b-256 produces 64-char hex string
+        assert HIPAAEncryption("other-key").hash_phi(data) != hash1  # Keyed by the encryption secret
+
+        hasher = self.encryption.phi_hasher()
+        hasher.update(data.encode())
+        assert hasher.hexdigest() == hash1  # Streaming hasher uses the same key
 
     def test_invalid_decryption(self):
         """Test handling of invalid encrypted data"""
         with pytest.raises(ValueError):
             self.encryption.decrypt_phi("invalid-encrypted-data")
 
+    def test_pregenerated_key_matches_derived_key(self):
+        """Test a pre-generated key decrypts data encrypted under the password it came from"""
+        derived = HIPAAEncryption.export_key("test-key-for-testing")
+        keyed = HIPAAEncryption(key=derived)
+
+        assert keyed.decrypt_phi(self.encryption.encrypt_phi("John Doe")) == "John Doe"
+        with pytest.raises(ValueError):
+            HIPAAEncryption(key="c2hvcnQ=")
+
+    def test_encrypt_decrypt_phi_bytes(self):
+        """Test binary PHI encryption is bound to its associated data"""
+        original_data = b"\x00\xffscan"
+        encrypted_data = self.encryption.encrypt_phi_bytes(original_data, b"frame-0")
+
+        assert encrypted_data != original_data
+        assert self.encryption.decrypt_phi_bytes(encrypted_data, b"frame-0") == original_data
+        with pytest.raises(ValueError):
+            self.encryption.decrypt_phi_bytes(encrypted_data, b"frame-1")
+
 
 class TestHIPAAValidator:
     """Test HIPAA validation functionality"""
@@ -112,6 +145,18 @@ class TestHIPAAValidator:
         assert sanitized["service_type"] == "consultation"
         assert sanitized["price"] == 100
 
+        message = {"message": "SSN 123-45-6789"}
+        assert self.validator.sanitize_phi_for_logging(message) == message
+        assert self.validator.sanitize_phi_for_logging(message, scan_values=True)["message"] == "[PHI_REDACTED]"
+
+    def test_scan_payload(self):
+        """Test PHI value detection in free text"""
+        payload = b'{"message": "SSN 123-45-6789, call (555) 234-5678, card 4111 1111 1111 1111"}'
+        assert self.validator.scan_payload(payload) == ["credit_card", "phone", "ssn"]
+        assert self.validator.scan_payload(b'{"mrn": "MRN: 00123456", "to": "a@b.org"}') == ["email", "mrn"]
+        assert self.validator.scan_payload(b"card 4111 1111 1111 1112, order 42") == []
+        assert self.validator.scan_payload(b"consultation for 30 minutes") == []
+
 
 class TestHIPAASecurityHeaders:
     """Test HIPAA security headers"""
@@ -178,7 +223,7 @@ class TestAuditLog:
         )
 
         # Should be able to convert to dict and JSON
-        audit_dict = audit_log.model_dump()
+        audit_dict = asdict(audit_log)
         json_str = json.dumps(audit_dict)
 
         assert isinstance(audit_dict, dict)
@@ -186,6 +231,141 @@ class TestAuditLog:
         assert "phi_create" in json_str
 
 
+class TestBatchWriter:
+    """Test buffered audit row writing"""
+
+    def setup_method(self):
+        self.batches = []
+        self.writer = BatchWriter(self.batches.append, "test", batch_size=10, max_age=0.2)
+
+    def teardown_method(self):
+        self.writer.close()
+
+    def wait_for_rows(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while sum(map(len, self.batches)) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return [row for batch in self.batches for row in batch]
+
+    def test_rows_below_threshold_written_within_max_age(self):
+        """Test a quiet period does not strand rows below the fill threshold"""
+        self.writer.put("a")
+        assert self.wait_for_rows(1) == ["a"]
+
+        # After the first batch the buffer is empty again; a new row must still be aged out
+        start = time.monotonic()
+        for row in "bc":
+            self.writer.put(row)
+        assert self.wait_for_rows(3, timeout=1.0) == ["a", "b", "c"]
+        assert time.monotonic() - start < 1.0
+
+    def test_fill_threshold_flushes_before_max_age(self):
+        """Test a buffer at the fill threshold is written without waiting for max_age"""
+        writer = BatchWriter(self.batches.append, "test", batch_size=10, max_age=60)
+        for row in "abc":  # 30% of 10
+            writer.put(row)
+        assert self.wait_for_rows(3) == ["a", "b", "c"]
+        writer.close()
+
+    def test_close_drains_buffer(self):
+        """Test close() writes rows that were not yet due"""
+        writer = BatchWriter(self.batches.append, "test", batch_size=10, max_age=60)
+        writer.put("a")
+        writer.close()
+        assert self.batches == [["a"]]
+
+    def test_rejected_batch_retried_row_by_row(self):
+        """Test only the row the database rejects is dropped from a batch"""
+        def write_batch(batch):
+            if "bad" in batch:
+                raise APIError({"code": "22P02", "message": "invalid input"})
+            self.batches.append(batch)
+
+        writer = BatchWriter(write_batch, "test", batch_size=10, max_age=60)
+        for row in ["a", "bad", "c"]:
+            writer.put(row)
+        writer.close()
+        assert self.batches == [["a"], ["c"]]
+
+    def test_unreachable_database_batch_requeued(self):
+        """Test a batch that could not be delivered is retried whole, not split"""
+        attempts = []
+
+        def write_batch(batch):
+            attempts.append(list(batch))
+            if len(attempts) == 1:
+                raise ConnectionError("database unreachable")
+            self.batches.append(batch)
+
+        writer = BatchWriter(write_batch, "test", batch_size=10, max_age=0.05)
+        for row in "abc":
+            writer.put(row)
+        assert self.wait_for_rows(3) == ["a", "b", "c"]
+        assert attempts == [["a", "b", "c"], ["a", "b", "c"]]
+        writer.close()
+
+    def test_full_buffer_drops_and_counts_rows(self):
+        """Test rows beyond max_buffer are dropped and counted rather than queued"""
+        writer = BatchWriter(self.batches.append, "test", batch_size=10, max_age=60, max_buffer=2)
+        writer._start = lambda: None  # keep rows buffered
+        for row in "abc":
+            writer.put(row)
+        assert writer.dropped == 1
+        assert [row for _, row in writer._buffer] == ["a", "b"]
+
+
+class TestPHIFileFrames:
+    """Test PHI file frame encryption"""
+
+    def setup_method(self):
+        self.saved_encryption = hipaa_compliance._encryption
+        hipaa_compliance._encryption = HIPAAEncryption("test-key-for-testing")
+
+    def teardown_method(self):
+        hipaa_compliance._encryption = self.saved_encryption
+
+    def write_phi(self, path, data):
+        upload = UploadFile(io.BytesIO(data))
+        return asyncio.run(HIPAAFileHandler._stream_to_disk(
+            upload, path, "medical_record/scan.pdf", True, hipaa_compliance.encryption.phi_hasher()
+        ))
+
+    def read_phi(self, raw, stored_filename="medical_record/scan.pdf"):
+        return b"".join(HIPAAFileHandler._read_phi_frames(io.BytesIO(raw), stored_filename))
+
+    def test_phi_frames_round_trip(self, tmp_path):
+        """Test multi-frame and empty PHI files decrypt to the original bytes"""
+        for data in (b"%PDF" + bytes(range(256)) * (UPLOAD_CHUNK_SIZE // 128), b""):
+            path = tmp_path / "scan.pdf"
+            file_size, head = self.write_phi(path, data)
+            raw = path.read_bytes()
+
+            assert file_size == len(data)
+            assert head == data[:UPLOAD_CHUNK_SIZE]
+            if data:
+                assert data[:64] not in raw  # stored encrypted
+            assert self.read_phi(raw) == data
+
+    def test_phi_frames_tamper_detected(self, tmp_path):
+        """Test modified, moved and truncated PHI files fail to decrypt"""
+        path = tmp_path / "scan.pdf"
+        self.write_phi(path, b"%PDF" + b"x" * (2 * UPLOAD_CHUNK_SIZE))
+        raw = path.read_bytes()
+        (first_length,) = PHI_FRAME_HEADER.unpack(raw[:PHI_FRAME_HEADER.size])
+        first_frame_end = PHI_FRAME_HEADER.size + first_length
+
+        flipped = bytearray(raw)
+        flipped[-1] ^= 1
+        with pytest.raises(ValueError):
+            self.read_phi(bytes(flipped))
+        with pytest.raises(ValueError):
+            self.read_phi(raw, "medical_record/other.pdf")
+        with pytest.raises(ValueError):
+            self.read_phi(raw[:first_frame_end])  # cut at a frame boundary
+        with pytest.raises(ValueError):
+            self.read_phi(b"")
+
+
 class TestHIPAACompliance:
     """Integration tests for HIPAA compliance"""
 
@@ -0,0 +1,25 @@
+"""
+Timestamp helpers for Dr. Kishan Bhalani Medical Documentation Services
+
+Audit logs, uploads and API responses all stamp records with UTC ISO-8601
+strings; this formats them without building a datetime per call.
+"""
+
+import time
+from datetime import datetime, timezone
+
+# (epoch second, 'YYYY-MM-DDTHH:MM:SS') for the last second formatted; one
+# tuple so concurrent threads never see a mismatched pair
+_iso_second = (0, '')
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as ISO-8601 with microseconds, e.g. 2024-01-01T12:00:00.000123+00:00"""
+    global _iso_second
+    ns = time.time_ns()
+    second, prefix = _iso_second
+    if ns // 1_000_000_000 != second:
+        second = ns // 1_000_000_000
+        prefix = datetime.fromtimestamp(second, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        _iso_second = (second, prefix)
+    return f"{prefix}.{ns % 1_000_000_000 // 1000:06d}+00:00"
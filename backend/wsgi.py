@@ -4,6 +4,7 @@ WSGI entry point for Dr. Kishan Bhalani Medical Documentation Services
 Compatible with Gunicorn and other WSGI servers
 """
 
+import importlib.util
 import os
 import sys
 from pathlib import Path
@@ -11,11 +12,12 @@ from pathlib import Path
 # Add current directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-# Import the FastAPI app
-try:
+# Import the FastAPI app, resolving which module exists before importing so
+# only one import graph is loaded on cold start
+if importlib.util.find_spec("server") is not None:
     from server import app
     print("✅ Main server loaded successfully")
-except ImportError:
+else:
     try:
         from server_simple import app
         print("✅ Simplified server loaded successfully")